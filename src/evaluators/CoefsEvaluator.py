@@ -1,6 +1,6 @@
 import pandas as pd
-import collections
 from .BaseEvaluator import BaseEvaluator
+from ..results.ColumnarResults import ColumnarResults
 from rich import print
 
 class CoefsEvaluator(BaseEvaluator):
@@ -11,30 +11,27 @@ class CoefsEvaluator(BaseEvaluator):
     def append_metrics_to_df(self, base_df, model_outputs):
         print(f"[dim]Appending metrics from '{self.name}'...")
         
-        all_coef_rows = []
+        all_coef_dfs = []
         for model_name, model_data in model_outputs.items():
-            if not model_data or 'coefs' not in model_data[0]:
-                print(f"[yellow]'{model_name}' has no coefficient data. Skipping in '{self.name}'.[/yellow]")
-                continue
-
-            for item in model_data:
-                predictors, coef_values = self._get_validated_coefs(item)
-                if predictors is None:
+            found = False
+            for results in ColumnarResults.parts(model_data):
+                if 'coefs' not in results.columns:
                     continue
+                found = True
+                datetimes = results.datetimes()
+                for predictors, rows, coefs in results.coefficients():
+                    df = pd.DataFrame(coefs, columns=[f"coef_{model_name}_{predictor}" for predictor in predictors])
+                    df.insert(0, 'datetime', datetimes[rows])
+                    all_coef_dfs.append(df)
+            if not found:
+                print(f"[yellow]'{model_name}' has no coefficient data. Skipping in '{self.name}'.[/yellow]")
 
-                row = {
-                    'datetime': pd.to_datetime(item['date']) + pd.to_timedelta(item['hour'], unit='h')
-                }
-                for predictor, coef_value in zip(predictors, coef_values):
-                    row[f"coef_{model_name}_{predictor}"] = coef_value
-                all_coef_rows.append(row)
-
-        if not all_coef_rows:
+        if not all_coef_dfs:
             print(f"[yellow]No valid coefficient data found across all models for '{self.name}'.[/yellow]")
             return base_df
 
         print("[dim]   -> Creating a single comprehensive coefficient DataFrame...")
-        all_coefs_df = pd.DataFrame(all_coef_rows)
+        all_coefs_df = pd.concat(all_coef_dfs, ignore_index=True)
         all_coefs_df = all_coefs_df.groupby('datetime').first().reset_index()
 
         print("[dim]   -> Merging coefficients into the main details table...")
@@ -44,18 +41,22 @@ class CoefsEvaluator(BaseEvaluator):
         return final_df
 
     def evaluate(self, data):
-        if not data: return pd.DataFrame()
-
-        long_format_df = self._flatten_to_long_format(data)
-        if long_format_df.empty: return pd.DataFrame()
-
+        index = {'all': ['predictor_name'], 'daily': ['horizon', 'predictor_name'], 'hourly': ['horizon', 'hour', 'predictor_name']}.get(self.type)
+        if index is None: return pd.DataFrame()
+
+        # sums and counts of the coefficients chunk by chunk, results of a sink are never loaded as a whole
+        sums = []
+        for results in ColumnarResults.parts(data):
+            long_format_df = self._flatten_to_long_format(results)
+            if not long_format_df.empty:
+                sums.append(long_format_df.groupby(index)['coef_value'].agg(['sum', 'count']))
+        if not sums: return pd.DataFrame()
+
+        sums = pd.concat(sums).groupby(level=index).sum()
+        means = (sums['sum'] / sums['count'])[sums['count'] > 0]
         if self.type == 'all':
-            return long_format_df.pivot_table(index='predictor_name', values='coef_value', aggfunc='mean').rename(columns={'coef_value': 'mean_coef'})
-        elif self.type == 'daily':
-            return long_format_df.pivot_table(index='horizon', columns='predictor_name', values='coef_value', aggfunc='mean')
-        elif self.type == 'hourly':
-            return long_format_df.pivot_table(index=['horizon', 'hour'], columns='predictor_name', values='coef_value', aggfunc='mean')
-        return pd.DataFrame()
+            return means.to_frame('mean_coef')
+        return means.unstack('predictor_name')
 
     def save_to_sheet(self, writer, model_results_dict):
         all_dfs = []
@@ -68,7 +69,7 @@ class CoefsEvaluator(BaseEvaluator):
             all_dfs.append(result_df)
             
             if i < len(model_names) - 1:
-                separator = pd.DataFrame('', index=result_df.index_col,
+                separator = pd.DataFrame('', index=result_df.index,
                                          columns=pd.MultiIndex.from_tuples([('|', f'sep_{i}')]))
                 all_dfs.append(separator)
         
@@ -87,39 +88,14 @@ class CoefsEvaluator(BaseEvaluator):
         styler.to_excel(writer, sheet_name=self.name, float_format="%.4f")
         print(f"[dim]Sheet '{self.name}' created.")
 
-    def _get_validated_coefs(self, item):
-        predictors = item.get('predictors')
-        coefs = item.get('coefs')
-
-        if not predictors or coefs is None or len(coefs) == 0:
-            return None, None
-
-        if not isinstance(predictors, list):
-            predictors = [predictors]
-        
-        if isinstance(coefs[0], list):
-            coef_values = coefs[0]
-        else:
-            coef_values = coefs
-
-        if len(predictors) != len(coef_values):
-            return None, None
-            
-        return predictors, coef_values
-
     def _flatten_to_long_format(self, data):
-        flat_data = []
-        for item in data:
-            predictors, coef_values = self._get_validated_coefs(item)
-            if predictors is None:
-                continue
-            
-            for predictor, coef_value in zip(predictors, coef_values):
-                flat_data.append({
-                    'hour': item.get('hour'),
-                    'horizon': item.get('horizon'),
-                    'predictor_name': predictor,
-                    'coef_value': coef_value
-                })
-        
-        return pd.DataFrame(flat_data)
\ No newline at end of file
+        flat_dfs = []
+        for predictors, rows, coefs in data.coefficients():
+            df = pd.DataFrame(coefs, columns=predictors)
+            df['hour'] = data.column('hour')[rows]
+            df['horizon'] = data.column('horizon')[rows]
+            flat_dfs.append(df.melt(id_vars=['hour', 'horizon'], var_name='predictor_name', value_name='coef_value'))
+
+        if not flat_dfs:
+            return pd.DataFrame()
+        return pd.concat(flat_dfs, ignore_index=True)
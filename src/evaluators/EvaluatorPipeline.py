@@ -2,6 +2,10 @@ import os
 import pandas as pd
 from rich import print
 import glob
+from ..models.ModelScheduler import ModelScheduler
+from ..models.DataPlane import DataPlane
+from ..results.BaseResults import BaseResults
+from ..results.ColumnarResults import ColumnarResults
 
 class EvaluatorPipeline:
     def __init__(self, data, testPeriodStart, testPeriodEnd, target="load", horizon=1, details=False):
@@ -24,11 +28,29 @@ class EvaluatorPipeline:
     def add_evaluator(self, evaluator):
         self.evaluators.append(evaluator)
 
-    def execute(self, output_filepath="results.xlsx"):
+    def execute(self, output_filepath="results.xlsx", mode="sequential"):
+        # mode="global" runs the tasks of all models in one shared pool instead of one pool per model
         print("[dim]Running all models.")
+        # keeps the preprocessed data planes alive between the models, so the data is preprocessed once
+        planes = [DataPlane.acquire(self.data, self.horizon, self.target, model.preprocess, model.precision) for model in self.models]
+        try:
+            if mode == "global":
+                outputs = ModelScheduler.run(self.models, self.horizon, self.data, self.testPeriodStart, self.testPeriodEnd, self.target)
+                model_outputs = {model.name: output for model, output in zip(self.models, outputs)}
+            elif mode == "sequential":
+                model_outputs = {
+                    model.name: model.run(self.horizon, self.data, self.testPeriodStart, self.testPeriodEnd, self.target)
+                    for model in self.models
+                }
+            else:
+                raise ValueError(f"Unknown mode '{mode}'. Available modes: sequential, global")
+        finally:
+            for plane in planes:
+                plane.release()
+        # one columnar copy of every in memory output, shared by all evaluators, the handles of sinks are read chunk by chunk
         model_outputs = {
-            model.name: model.run(self.horizon, self.data, self.testPeriodStart, self.testPeriodEnd, self.target)
-            for model in self.models
+            name: output if isinstance(output, BaseResults) else ColumnarResults.of(output)
+            for name, output in model_outputs.items()
         }
         print("[dim]Model runs complete.")
 
@@ -59,14 +81,26 @@ class EvaluatorPipeline:
                     }
                     evaluator.save_to_sheet(writer, model_results)
 
+            self._create_search_sheets(writer, model_outputs)
+
         print(f"[green]Successfully saved all results to {output_filepath}")
 
     def _create_base_details_df(self, model_outputs):
         all_model_dfs = []
         for model_name, model_data in model_outputs.items():
-            if not model_data: continue
-            df = pd.DataFrame(model_data)
-            df['datetime'] = pd.to_datetime(df['date']) + pd.to_timedelta(df['hour'], unit='h')
+            # only the columns of the table are kept from every chunk
+            chunks = [
+                pd.DataFrame({
+                    'datetime': results.datetimes(),
+                    'hour': results.column('hour'),
+                    'horizon': results.column('horizon'),
+                    'value': results.column('value'),
+                    'prediction': results.column('prediction'),
+                })
+                for results in ColumnarResults.parts(model_data)
+            ]
+            if not chunks: continue
+            df = pd.concat(chunks, ignore_index=True)
             df.rename(columns={'prediction': f'prediction_{model_name}'}, inplace=True)
             df.set_index(['datetime', 'hour', 'horizon', 'value'], inplace=True)
             all_model_dfs.append(df[[f'prediction_{model_name}']])
@@ -77,6 +111,16 @@ class EvaluatorPipeline:
         final_columns = ['datetime', 'date', 'hour', 'horizon', 'value'] + model_pred_cols
         return combined_df[final_columns]
 
+    def _create_search_sheets(self, writer, model_outputs):
+        # hyperparameters chosen over time by the models searching them every few days (MLPModel searchEvery)
+        for model in self.models:
+            if not hasattr(model, 'searchSummary'): continue
+            summary = model.searchSummary(model_outputs[model.name])
+            if summary.empty: continue
+            sheet_name = f"Search {model.name}"[:31]
+            summary.to_excel(writer, sheet_name=sheet_name, index=False)
+            print(f"[dim]Sheet '{sheet_name}' created.")
+
     def _create_info_sheet(self, writer):
         info_data = [{'Parameter': 'Test Period Start', 'Value': self.testPeriodStart}, {'Parameter': 'Test Period End', 'Value': self.testPeriodEnd}, {'Parameter': 'Forecast Horizon', 'Value': f'{self.horizon} steps'},]
         for model in self.models:
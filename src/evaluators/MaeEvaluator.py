@@ -1,6 +1,7 @@
+import numpy as np
 import pandas as pd
-import collections
 from .BaseEvaluator import BaseEvaluator
+from ..results.ColumnarResults import ColumnarResults
 from rich import print
 
 class MaeEvaluator(BaseEvaluator):
@@ -39,34 +40,48 @@ class MaeEvaluator(BaseEvaluator):
             styler.to_excel(writer, sheet_name=self.name, float_format="%.2f")
             print(f"[dim]Sheet '{self.name}' (Styled) created.")
         
-    def _calculate_mae(self, errors):
-        return sum(errors) / len(errors) if errors else 0
-        
+    def _errors(self, data):
+        # absolute errors chunk by chunk, results of a sink are never loaded as a whole
+        for results in ColumnarResults.parts(data):
+            yield pd.DataFrame({
+                'hour': results.column('hour'),
+                'horizon': results.column('horizon'),
+                'error': np.abs(results.column('prediction') - results.column('value')),
+            })
+
+    def _mean(self, data, keys):
+        sums = [errors.groupby(keys)['error'].agg(['sum', 'count']) for errors in self._errors(data)]
+        if not sums:
+            return pd.Series(dtype=np.float64)
+        sums = pd.concat(sums).groupby(level=keys).sum()
+        return sums['sum'] / sums['count']
+
     def _evaluate_all(self, data):
-        errors = [abs(item['prediction'] - item['value']) for item in data if 'prediction' in item]
-        return {'overall_mae': self._calculate_mae(errors)}
+        total, count = 0.0, 0
+        for errors in self._errors(data):
+            total += errors['error'].sum()
+            count += errors['error'].count()
+        return {'overall_mae': float(total / count) if count else 0}
 
     def _evaluate_daily(self, data):
-        daily_errors = collections.defaultdict(list)
-        for item in data:
-            daily_errors[f"horizon_{item['horizon']}"].append(abs(item['prediction'] - item['value']))
-        return {horizon: self._calculate_mae(errors) for horizon, errors in daily_errors.items()}
+        errors = self._mean(data, ['horizon'])
+        return {f"horizon_{horizon}": float(mae) for horizon, mae in errors.items()}
 
     def _evaluate_hourly(self, data):
-        hourly_errors = collections.defaultdict(lambda: collections.defaultdict(list))
-        for item in data:
-            error = abs(item['prediction'] - item['value'])
-            hourly_errors[f"hour_{item['hour']}"][f"horizon_{item['horizon']}"].append(error)
-        return {hour: {h: self._calculate_mae(e) for h, e in horizons.items()} for hour, horizons in hourly_errors.items()}
+        errors = self._mean(data, ['hour', 'horizon'])
+        hourly = {}
+        for (hour, horizon), mae in errors.items():
+            hourly.setdefault(f"hour_{hour}", {})[f"horizon_{horizon}"] = float(mae)
+        return hourly
 
     def _create_hourly_comparison_sheet(self, writer, sheet_name, results_dict):
         sheet_name = sheet_name[:31]
         try:
             all_dfs, model_names = [], list(results_dict.keys())
             if not model_names: return
-            ref_index = pd.DataFrame.from_dict(results_dict[model_names[0]], orient='index_col').index
+            ref_index = pd.DataFrame.from_dict(results_dict[model_names[0]], orient='index').index
             for i, name in enumerate(model_names):
-                df = pd.DataFrame.from_dict(results_dict[name], orient='index_col')
+                df = pd.DataFrame.from_dict(results_dict[name], orient='index')
                 df.columns = pd.MultiIndex.from_product([[name], df.columns])
                 all_dfs.append(df)
                 if i < len(model_names) - 1:
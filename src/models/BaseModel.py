@@ -2,12 +2,22 @@ import os
 os.environ["MKL_NUM_THREADS"] = "1"
 os.environ["NUMEXPR_NUM_THREADS"] = "1"
 os.environ["OMP_NUM_THREADS"] = "1"
+import itertools
 import json
+import math
+import signal
+import threading
+from collections import deque
+from contextlib import contextmanager
 from .ModelWorker import ModelWorker
+from .DataPlane import DataPlane
+from .PredictorCompiler import PredictorCompiler
+from .ResultCache import ResultCache
+from .Checkpoint import Checkpoint
+from ..results.ColumnarResults import ColumnarResults
 from abc import ABC, abstractmethod
 from rich import print
-from rich.progress import track
-from multiprocessing import shared_memory
+from rich.progress import Progress, track
 import multiprocessing as mp
 import pandas as pd
 import numpy as np
@@ -15,6 +25,34 @@ from ..scalers.StandardScaler import StandardScaler
 
 
 class BaseModel(ABC):
+    # engine -> kernel it runs, batch and recursive are optional kernels solving a whole (hour, horizon) series at once
+    engines = {"pool": "one", "batched": "batch", "recursive": "recursive"}
+    batch = None
+    recursive = None
+    # optional NumPy variant of one, oneArray(trainX, trainY, testX, context), used by the pool engine when available
+    oneArray = None
+    # optional split of oneArray, fitArray(trainX, trainY, testX, context) -> estimator and predictArray(estimator, testX, context),
+    # needed to recalibrate less often than daily
+    fitArray = None
+    predictArray = None
+    # optional stateful variant of oneArray, seriesArray(trainX, trainY, testX, context, state), state is a dict kept
+    # between the consecutive days of a block of one (hour, horizon) series, e.g. for warm starts
+    seriesArray = None
+    # optional kernel solving stacked scaled normal equations, normalArray(gram, moment, testX, context) -> (predictions, params),
+    # several training windows then share the cross product sums of their rows
+    normalArray = None
+    # optional kernel of models that need no fitting, directArray(testX, context) -> (predictions, params) of all test
+    # rows of a block at once, testX is not scaled. run() then computes the forecasts in process, without the pool
+    directArray = None
+    # relative cost of one fit per day of training window, only used to order the tasks of the global scheduler
+    cost = 1
+    # internalParams that do not change the forecasts, e.g. the settings of a hyperparameter study, left out of the
+    # setup hash of the result cache and the checkpoint
+    studyParams = ()
+    # pool tasks in flight per process, enough to keep the processes busy while the main process collects
+    tasksInFlight = 4
+    jobIds = itertools.count()
+
     def __init__(
         self,
         predictors=[],
@@ -23,13 +61,40 @@ class BaseModel(ABC):
         modelParams={},
         internalParams={},
         saveToFile=None,
+        engine="pool",
+        blockSize=None,
+        cache=False,
+        recalibrationEvery=1,
+        precision="float64",
+        sink=None,
+        checkpoint=None,
     ):
+        if engine not in self.engines:
+            raise ValueError(f"Unknown engine '{engine}'. Available engines: {', '.join(self.engines)}")
+        if getattr(self, self.engines[engine]) is None:
+            raise ValueError(f"{type(self).__name__} does not support the {engine} engine")
+        if recalibrationEvery > 1 and (engine != "pool" or self.fitArray is None or self.predictArray is None):
+            raise ValueError(f"{type(self).__name__} does not support recalibrationEvery with the {engine} engine")
+        if recalibrationEvery > 1 and self.seriesArray is not None:
+            raise ValueError(f"{type(self).__name__} does not support recalibrationEvery together with a stateful series kernel")
+        if isinstance(trainingWindow, (list, tuple)) and (engine != "pool" or self.oneArray is None or recalibrationEvery > 1):
+            raise ValueError(f"{type(self).__name__} does not support several training windows with the {engine} engine or recalibrationEvery")
         self.predictors = predictors
-        self.trainingWindow = trainingWindow
+        # several training windows (e.g. [56, 84, 364, 728]) are fitted side by side and their forecasts averaged,
+        # trainingWindow is then the longest of them
+        self.trainingWindows = sorted(set(trainingWindow)) if isinstance(trainingWindow, (list, tuple)) else None
+        self.trainingWindow = self.trainingWindows[-1] if self.trainingWindows else trainingWindow
         self.modelParams = modelParams
         self.internalParams = internalParams
         self.saveToFile = saveToFile
         self.name = name
+        self.engine = engine
+        self.blockSize = blockSize
+        self.cache = cache
+        self.recalibrationEvery = recalibrationEvery
+        self.precision = precision
+        self.sink = sink
+        self.checkpoint = checkpoint
         self.scaler = StandardScaler()
 
     def preprocess(self, data, horizon, target):
@@ -37,8 +102,8 @@ class BaseModel(ABC):
         for i in range(1, horizon + 1):
             data[f"{target}_d+{i}"] = data[target].shift(-24 * i)
         data["numeric_index"] = np.arange(1, len(data) + 1)
-        data.index_col = pd.to_datetime(data.index_col)
-        data["hour"] = data.index_col.hour
+        data.index = pd.to_datetime(data.index)
+        data["hour"] = data.index.hour
         data[f"ones"] = 1
         data["day"] = data["numeric_index"] // 24
         return data
@@ -48,86 +113,373 @@ class BaseModel(ABC):
         pass
 
     def run(self, horizon, data, testPeriodStart, testPeriodEnd, target="load"):
+        with BaseModel.terminating():
+            job = self.prepare(horizon, data, testPeriodStart, testPeriodEnd, target)
+            try:
+                if job["tasks"] is not None:
+                    processes = BaseModel.processes()
+                    with mp.Pool(processes=processes, initializer=ModelWorker.initialize, initargs=({job["key"]: job["run"]},)) as pool:
+                        with Progress() as progress:
+                            bar = progress.add_task(f"[magenta]Running model {self.name}", total=job["forecasts"])
+                            for _, block in BaseModel.feed(pool, ((job, task) for task in job["tasks"])):
+                                self.collect(job, block)
+                                progress.update(bar, completed=job["done"])
+                return self.finish(job)
+            finally:
+                self.release(job)
+
+    def prepare(self, horizon, data, testPeriodStart, testPeriodEnd, target="load"):
+        # everything of a run before the pool: the pool engine shares the data and lists its tasks,
+        # which run() or the global scheduler of EvaluatorPipeline execute, then finish() assembles the results
+        job = {"model": self, "key": None, "run": None, "tasks": None, "results": {}}
         if self.saveToFile and os.path.exists(f"./results/{self.saveToFile}"):
             os.makedirs("./results", exist_ok=True)
             print(f"[yellow]Loading model results from file {self.saveToFile}")
             with open(f"./results/{self.saveToFile}", "r") as f:
-                return json.load(f)
+                job["saved"] = json.load(f)
+            return job
+
+        plane = DataPlane.acquire(data, horizon, target, self.preprocess, self.precision)
+        job["plane"] = plane
+        try:
+            self.prepareJob(job, plane, horizon, testPeriodStart, testPeriodEnd, target)
+        except BaseException:
+            # e.g. a missing predictor column, nothing of the run is left behind
+            self.release(job)
+            raise
+        return job
 
-        data = self.preprocess(data, horizon, target)
+    def prepareJob(self, job, plane, horizon, testPeriodStart, testPeriodEnd, target):
+        data = plane.frame
         datasetOffset = int(data.loc[testPeriodStart, "day"].values[0])
         testingWindow = int(data.loc[testPeriodEnd, "day"].values[0])
 
-        data = data.drop('utc_datetime', axis=1, errors='ignore')
-        shape = data.shape
-        dtype = data.values.dtype
-        shm = shared_memory.SharedMemory(create=True, size=data.values.nbytes)
-        np_array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
-        np_array[:] = data.values[:]
+        self.beforeHook(horizon, data, testPeriodStart, testPeriodEnd, datasetOffset, testingWindow, target)
+        compiler = self.compilePredictors(data, horizon, datasetOffset, target)
 
-        tasks = []
-        results = []
+        rowIndex = plane.rowIndex
+        cache = ResultCache(self, target, data, rowIndex) if self.cache else None
+        checkpoint = Checkpoint(self.checkpoint, self, target, plane, horizon, datasetOffset, testingWindow) if self.checkpoint else None
+        if checkpoint is not None:
+            job["checkpoint"] = checkpoint
+        if self.sink is not None:
+            self.sink.open()
+            job["sink"] = self.sink
+        job.update(
+            data=data,
+            rowIndex=rowIndex,
+            horizon=horizon,
+            datasetOffset=datasetOffset,
+            testingWindow=testingWindow,
+            target=target,
+            cache=cache,
+            stores=[store for store in (cache, checkpoint) if store is not None],
+            compiler=compiler,
+        )
+        if self.direct:
+            job["direct"] = True
+        elif self.engine == "pool":
+            self.sharePool(job)
 
-        self.beforeHook(horizon, data, testPeriodStart, testPeriodEnd, datasetOffset, testingWindow, target)
-     
-        for dayInTestingPeriod in range(testingWindow - datasetOffset + 1):
-            for currentHorizon in range(1, horizon + 1):
-                for hour in range(0, 24):
-                    context = {
-                        "hour": hour,
-                        "dayInTestingPeriod": dayInTestingPeriod,
-                        "datasetOffset": datasetOffset,
-                        "horizon": currentHorizon,
-                        "trainingWindow": self.trainingWindow,
-                        "modelParams": self.modelParams,
-                        "internalParams": self.internalParams
-                    }
-                    context["target"] = f"{target}_d+{currentHorizon}"
-                    context["predictors"] = self.processColumns(
-                        self.predictors, context)
-                    inMemoryData = {
-                        "pointer": shm.name,
-                        "shape": shape,
-                        "dtype": dtype,
-                        "index_col": data.index_col,
-                        "columns": data.columns,
-                    }
-                    tasks.append(
-                        (context, inMemoryData, self.one, self.scaler))
-                    # results.append(ModelWorker.worker((context, inMemoryData, self.one, self.scaler)))
-
-        processes = int(os.environ.get("MAX_THREADS") or mp.cpu_count())
-        with mp.Pool(processes=processes) as pool:
-            for result in track(
-                pool.imap(ModelWorker.worker, tasks),
-                description=f"[magenta]Running model {self.name}",
-                total=len(tasks),
-            ):
-                results.append(result)
-
-        shm.close()
-        shm.unlink()
+    def compilePredictors(self, data, horizon, datasetOffset, target):
+        # every (hour, horizon) is compiled before the pool starts, so a missing column fails right away. Predictors
+        # depending on dayInTestingPeriod are only checked on the first day here, the other days compile as they run
+        compiler = PredictorCompiler(self.predictors, data.columns)
+        for currentHorizon in range(1, horizon + 1):
+            for hour in range(0, 24):
+                for _ in self.blocks(compiler, [0], hour, currentHorizon, datasetOffset, target):
+                    pass
+        return compiler
+
+    def collect(self, job, block):
+        job["done"] += len(block)
+        for store in job["stores"]:
+            for result in block:
+                store.put(result)
+        self.keep(job, block)
+
+    def keep(self, job, records):
+        # records of a run go straight to its sink, so a sink bounds memory for every engine and for resumed runs
+        if "sink" in job:
+            job["sink"].write(records)
+            return
+        for result in records:
+            job["results"][(result["dayInTestingPeriod"], result["horizon"], result["hour"])] = result
+
+    def finish(self, job):
+        if "saved" in job:
+            return ColumnarResults.fromRecords(job["saved"])
+        if "direct" in job:
+            results = self.runDirect(job)
+        elif self.engine != "pool":
+            results = self.runBatched(job["data"], job["rowIndex"], job["horizon"], job["datasetOffset"], job["testingWindow"], job["target"], job["stores"], job.get("sink"))
+        else:
+            results = [job["results"][key] for key in sorted(job["results"])]
+        if "sink" in job:
+            # every engine already streamed its records to the sink
+            results = job.pop("sink").close()
+        else:
+            results = ColumnarResults.of(results)
+        checkpoint = job.pop("checkpoint", None)
+        self.release(job)
+
+        cache = job["cache"]
+        if cache is not None:
+            cache.save()
+            print(f"[dim]{cache.hits} of {len(results)} forecasts of {self.name} reused from cache")
+        if checkpoint is not None:
+            checkpoint.remove()
+            if checkpoint.hits:
+                print(f"[dim]{checkpoint.hits} of {len(results)} forecasts of {self.name} resumed from checkpoint")
 
         if self.saveToFile:
             with open(f"./results/{self.saveToFile}", "w") as f:
-                json.dump(results, f)
+                # written record by record, results can be a lazy handle of a sink
+                f.write("[")
+                for position, result in enumerate(results):
+                    f.write(("" if position == 0 else ", ") + json.dumps(result))
+                f.write("]")
 
         return results
 
+    def release(self, job):
+        # also called on failures, the checkpoint keeps everything collected so far
+        checkpoint = job.pop("checkpoint", None)
+        if checkpoint is not None:
+            checkpoint.close()
+        sink = job.pop("sink", None)
+        if sink is not None:
+            sink.close()
+        plane = job.pop("plane", None)
+        if plane is not None:
+            plane.release()
+
+    def sharePool(self, job):
+        # workers open the data plane by its path, one key per job since several models can share a plane, and
+        # a long lived pool sees many jobs
+        job["key"] = f"{job['plane'].path}:{next(BaseModel.jobIds)}"
+        job["run"] = {
+            "data": {"plane": job["plane"].path},
+            "context": {
+                "datasetOffset": job["datasetOffset"],
+                "trainingWindow": self.trainingWindow,
+                "trainingWindows": self.trainingWindows,
+                "modelParams": self.modelParams,
+                "internalParams": self.internalParams,
+            },
+            "model": self.one,
+            "arrayModel": self.oneArray,
+            "fitModel": self.fitArray,
+            "predictModel": self.predictArray,
+            "seriesModel": self.seriesArray,
+            "normalModel": self.normalArray,
+            "recalibrationEvery": self.recalibrationEvery,
+            "scaler": self.scaler,
+        }
+        job["forecasts"] = (job["testingWindow"] - job["datasetOffset"] + 1) * job["horizon"] * 24
+        job["done"] = 0
+        # the tasks are produced while the pool runs, None when every forecast is already done
+        tasks = self.poolTasks(job)
+        first = next(tasks, None)
+        job["tasks"] = None if first is None else itertools.chain([first], tasks)
+
+    def poolTasks(self, job):
+        data, horizon, datasetOffset, target, stores = (job[key] for key in ("data", "horizon", "datasetOffset", "target", "stores"))
+        days = list(range(job["testingWindow"] - datasetOffset + 1))
+        # by default cut every (hour, horizon) series into blocks so that each process gets a few of them
+        blockSize = self.blockSize or math.ceil(len(days) / math.ceil(BaseModel.processes() * 4 / (horizon * 24)))
+        # blocks start on recalibration days, so every fit is reused by the whole block
+        blockPeriod = self.blockPeriod(len(days))
+        blockSize = math.ceil(blockSize / blockPeriod) * blockPeriod
+
+        compiler = job["compiler"]
+        for first in range(0, len(days), blockSize):
+            for currentHorizon in range(1, horizon + 1):
+                for hour in range(0, 24):
+                    for context, blockDays in self.blocks(compiler, days[first:first + blockSize], hour, currentHorizon, datasetOffset, target):
+                        if stores:
+                            hits, blockDays = BaseModel.lookup(stores, context, blockDays)
+                            self.keep(job, hits.values())
+                            job["done"] += len(hits)
+                            if not blockDays:
+                                continue
+                        if job.get("cancelled"):
+                            # e.g. a pruned trial, the tasks already in flight still finish
+                            return
+                        block = {key: context[key] for key in ("hour", "horizon", "target", "predictors", "columns")}
+                        yield job["key"], block, blockDays
+
+    @staticmethod
+    def feed(pool, tasks, meanwhile=None):
+        # runs the (job, task) pairs of a generator on the pool with a bounded number of tasks in flight and yields
+        # (job, block) in order. Tasks are only produced when the pool has room for them, so memory does not grow
+        # with the test period and the first results arrive right away. meanwhile runs once the pool is busy
+        limit = BaseModel.processes() * BaseModel.tasksInFlight
+        pending = deque()
+        for job, task in tasks:
+            pending.append((job, pool.apply_async(ModelWorker.blockWorker, (task,))))
+            if len(pending) < limit:
+                continue
+            if meanwhile is not None:
+                meanwhile()
+                meanwhile = None
+            job, block = pending.popleft()
+            yield job, block.get()
+        if meanwhile is not None:
+            meanwhile()
+        while pending:
+            job, block = pending.popleft()
+            yield job, block.get()
+
+    def blockPeriod(self, days):
+        # pool blocks are cut at multiples of this number of days
+        return self.recalibrationEvery
+
+    def taskCost(self, days):
+        # relative cost of a task, the global scheduler starts the most expensive ones first
+        fits = len({day - day % self.recalibrationEvery for day in days})
+        return self.cost * sum(self.trainingWindows or [self.trainingWindow]) * fits
+
+    @staticmethod
+    def processes():
+        return int(os.environ.get("MAX_THREADS") or mp.cpu_count())
+
+    def blocks(self, compiler, days, hour, currentHorizon, datasetOffset, target):
+        # consecutive days sharing the same predictors form one block
+        block = []
+        for dayInTestingPeriod in days:
+            context = {
+                "hour": hour,
+                "dayInTestingPeriod": dayInTestingPeriod,
+                "datasetOffset": datasetOffset,
+                "horizon": currentHorizon,
+                "trainingWindow": self.trainingWindow,
+                "modelParams": self.modelParams,
+                "internalParams": self.internalParams
+            }
+            context["target"] = f"{target}_d+{currentHorizon}"
+            context["predictors"], context["columns"] = compiler.compile(context)
+            if block and block[0][0]["predictors"] != context["predictors"]:
+                yield block[0][0], [day for _, day in block]
+                block = []
+            block.append((context, dayInTestingPeriod))
+        if block:
+            yield block[0][0], [day for _, day in block]
+
+    @property
+    def direct(self):
+        return self.directArray is not None and self.engine == "pool" and self.recalibrationEvery == 1
+
+    def runDirect(self, job):
+        # one vectorized lookup per block of an (hour, horizon) series, e.g. the lagged values of NaiveModel,
+        # the forecasts go into the columns of the results without building records
+        plane, horizon, datasetOffset, target, stores = (job[key] for key in ("plane", "horizon", "datasetOffset", "target", "stores"))
+        days = list(range(job["testingWindow"] - datasetOffset + 1))
+        compiler = job["compiler"]
+        parts = []
+        for currentHorizon in range(1, horizon + 1):
+            for hour in range(0, 24):
+                for context, blockDays in self.blocks(compiler, days, hour, currentHorizon, datasetOffset, target):
+                    hits, blockDays = BaseModel.lookup(stores, context, blockDays)
+                    blockParts = [ColumnarResults.fromRecords(hits.values())]
+                    if blockDays:
+                        blockParts.append(ModelWorker.directWorker(plane, job["rowIndex"], context, blockDays, self.directArray))
+                        for store in stores:
+                            for result in blockParts[-1]:
+                                store.put(result)
+                    if "sink" in job:
+                        for part in blockParts:
+                            job["sink"].write(part)
+                    else:
+                        parts.extend(blockParts)
+        if "sink" in job:
+            return None
+        results = ColumnarResults.concat(parts)
+        # same ordering as the pool engine
+        return results.take(np.lexsort([results.column(key) for key in ("hour", "horizon", "dayInTestingPeriod")]))
+
+    def runBatched(self, data, rowIndex, horizon, datasetOffset, testingWindow, target, stores=(), sink=None):
+        days = list(range(testingWindow - datasetOffset + 1))
+        worker = ModelWorker.recursiveWorker if self.engine == "recursive" else ModelWorker.batchWorker
+        kernel = getattr(self, self.engines[self.engine])
+        compiler = PredictorCompiler(self.predictors, data.columns)
+        series = {}
+        for currentHorizon in track(
+            range(1, horizon + 1),
+            description=f"[magenta]Running model {self.name}",
+        ):
+            for hour in range(0, 24):
+                context = {
+                    "hour": hour,
+                    "dayInTestingPeriod": days[0],
+                    "datasetOffset": datasetOffset,
+                    "horizon": currentHorizon,
+                    "trainingWindow": self.trainingWindow,
+                    "modelParams": self.modelParams,
+                    "internalParams": self.internalParams
+                }
+                context["target"] = f"{target}_d+{currentHorizon}"
+                context["predictors"], _ = compiler.compile(context)
+                if compiler.dayDependent:
+                    raise ValueError(f"The {self.engine} engine needs predictors that do not depend on dayInTestingPeriod")
+                hits, seriesDays = BaseModel.lookup(stores, context, days)
+                if seriesDays:
+                    for result in worker(data, context, seriesDays, kernel, self.scaler, rowIndex):
+                        hits[result["dayInTestingPeriod"]] = result
+                        for store in stores:
+                            store.put(result)
+                if sink is not None:
+                    # the series goes to the sink as soon as it is done
+                    sink.write([hits[day] for day in days])
+                    continue
+                series[(currentHorizon, hour)] = hits
+
+        if sink is not None:
+            return []
+
+        # same ordering as the pool engine
+        return [
+            series[(currentHorizon, hour)][day]
+            for day in days
+            for currentHorizon in range(1, horizon + 1)
+            for hour in range(0, 24)
+        ]
+
+    @staticmethod
+    def lookup(stores, context, days):
+        # forecasts already done in one of the stores (result cache, checkpoint) and the days still to compute,
+        # every store only sees the days the stores before it miss and gets the hits of the ones after it
+        found = {}
+        for position, store in enumerate(stores):
+            hits, days = store.lookup(context, days)
+            for result in hits.values():
+                for earlier in stores[:position]:
+                    earlier.put(result)
+            found.update(hits)
+            if not days:
+                break
+        return found, days
+
+    @staticmethod
+    @contextmanager
+    def terminating():
+        # SIGTERM raises SystemExit like Ctrl-C raises KeyboardInterrupt, so the finally blocks release the
+        # data plane and sync the checkpoint of a killed run
+        if threading.current_thread() is not threading.main_thread():
+            yield
+            return
+        previous = signal.signal(signal.SIGTERM, BaseModel.terminate)
+        try:
+            yield
+        finally:
+            signal.signal(signal.SIGTERM, previous if previous is not None else signal.SIG_DFL)
+
+    @staticmethod
+    def terminate(signum, frame):
+        raise SystemExit(128 + signum)
+
     def processColumns(self, columns, context):
-        processedColumns = []
-        if callable(columns):
-            columns = columns(context)
-
-        for column in columns:
-            if callable(column):
-                processedColumns.append(column(context))
-            else:
-                for key in context:
-                    column = column.replace(f"{{{key}}}", str(context[key]))
-                processedColumns.append(column)
-
-        return processedColumns
+        return PredictorCompiler.resolve(columns, context)
 
     @staticmethod
     @abstractmethod
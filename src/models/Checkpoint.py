@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import time
+from .ResultCache import ResultCache
+
+
+class Checkpoint:
+    # completed forecasts of a run, appended to <directory>/forecasts.jsonl and synced to disk every interval seconds.
+    # A run of the same model on the same data and test period resumes from it, a finished run removes it
+    def __init__(self, directory, model, target, plane, horizon, datasetOffset, testingWindow, interval=30):
+        self.path = os.path.join(directory, "forecasts.jsonl")
+        self.interval = interval
+        self.key = ResultCache.setup(
+            model, target, horizon=horizon, datasetOffset=datasetOffset, testingWindow=testingWindow, data=Checkpoint.fingerprint(plane)
+        )
+        self.done = {}
+        self.hits = 0
+        if os.path.exists(self.path):
+            self.load()
+        os.makedirs(directory, exist_ok=True)
+        if self.done:
+            # drops the line an interruption cut, the next records start on a line of their own
+            os.truncate(self.path, self.end)
+            self.file = open(self.path, "a")
+        else:
+            self.file = open(self.path, "w")
+            self.file.write(json.dumps({"key": self.key}) + "\n")
+        self.synced = time.monotonic()
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            if not header.endswith(b"\n") or json.loads(header).get("key") != self.key:
+                return
+            # end of the last complete line
+            self.end = len(header)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # last line cut by the interruption
+                record = json.loads(line)
+                self.done[(record["dayInTestingPeriod"], record["horizon"], record["hour"])] = record
+                self.end += len(line)
+
+    def lookup(self, context, days):
+        hits, missing = {}, []
+        for day in days:
+            record = self.done.get((day, context["horizon"], context["hour"]))
+            if record is None:
+                missing.append(day)
+            else:
+                hits[day] = record
+        self.hits += len(hits)
+        return hits, missing
+
+    def put(self, record):
+        self.file.write(json.dumps(record) + "\n")
+        if time.monotonic() - self.synced > self.interval:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def remove(self):
+        self.file.close()
+        os.remove(self.path)
+
+    @staticmethod
+    def fingerprint(plane):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(plane.index.values.tobytes())
+        for position, column in enumerate(plane.columns):
+            digest.update(column.encode())
+            digest.update(plane.column(position).tobytes())
+        return digest.hexdigest()
@@ -0,0 +1,167 @@
+import atexit
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import weakref
+import numpy as np
+import pandas as pd
+from .RowIndex import RowIndex
+
+
+class DataPlane:
+    # preprocessed data of one (data, horizon, target), written once as one memory mapped file per column which
+    # every model of the process and every pool worker reads without copying. Planes are reference counted, the last
+    # release removes the files, and the files of crashed processes are removed by the next build
+    directory = os.path.join(tempfile.gettempdir(), "epftoolbox-planes")
+    planes = {}
+    opened = {}
+
+    def __init__(self, path, key=None, source=None):
+        self.path = path
+        self.key = key
+        self.source = source
+        self.references = 0
+        self.owner = os.getpid()
+        with open(os.path.join(path, "columns.json"), "r") as f:
+            columns = json.load(f)
+        self.columns = columns["columns"]
+        self.dtypes = [np.dtype(dtype) for dtype in columns["dtypes"]]
+        self.positions = {column: position for position, column in enumerate(self.columns)}
+        self.index = pd.DatetimeIndex(np.load(os.path.join(path, "index.npy")), name=columns["index"])
+        if columns["tz"] is not None:
+            self.index = self.index.tz_localize("UTC").tz_convert(columns["tz"])
+        rowIndexPath = os.path.join(path, "rowIndex.npy")
+        self.rowIndex = RowIndex(np.asarray(np.load(rowIndexPath, mmap_mode="r"))) if os.path.exists(rowIndexPath) else None
+        self.mapped = {}
+        self.dataFrame = None
+
+    @staticmethod
+    def acquire(data, horizon, target, preprocess, precision="float64"):
+        # the plane of the data, built on first use, every acquire needs its release
+        key = (id(data), horizon, target, getattr(preprocess, "__func__", preprocess), precision)
+        for plane in DataPlane.planes.values():
+            # data already preprocessed into a plane of the same setup, e.g. the frame beforeHook gets
+            if plane.dataFrame is data and plane.key[1:] == key[1:]:
+                plane.references += 1
+                return plane
+        plane = DataPlane.planes.get(key)
+        if plane is None or plane.source() is not data:
+            plane = DataPlane.build(preprocess(data, horizon, target), precision, key, weakref.ref(data), target)
+            DataPlane.planes[key] = plane
+        plane.references += 1
+        return plane
+
+    def release(self):
+        self.references -= 1
+        if self.references > 0:
+            return
+        if DataPlane.planes.get(self.key) is self:
+            del DataPlane.planes[self.key]
+        self.mapped, self.dataFrame, self.rowIndex = {}, None, None
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def column(self, position):
+        # columns are mapped on first use, so a process only maps the columns its models read
+        if position not in self.mapped:
+            # plain ndarray view of the map, np.memmap indexing is noticeably slower in the hot path
+            self.mapped[position] = np.asarray(np.load(os.path.join(self.path, f"{position}.npy"), mmap_mode="r"))
+        return self.mapped[position]
+
+    def take(self, rows, positions):
+        # (rows, positions) float64 matrix, gathered column by column
+        out = np.empty((len(positions), len(rows)))
+        for i, position in enumerate(positions):
+            out[i] = self.column(position)[rows]
+        return out.T
+
+    @property
+    def frame(self):
+        # DataFrame over the mapped columns, without copying them
+        if self.dataFrame is None:
+            self.dataFrame = pd.DataFrame(
+                {column: self.column(position) for position, column in enumerate(self.columns)}, index=self.index, copy=False
+            )
+        return self.dataFrame
+
+    @staticmethod
+    def build(frame, precision="float64", key=None, source=None, target=None):
+        DataPlane.sweep()
+        frame = frame.drop('utc_datetime', axis=1, errors='ignore')
+        path = os.path.join(DataPlane.directory, f"{os.getpid()}-{uuid.uuid4().hex}")
+        os.makedirs(path)
+        dtypes = []
+        for position, column in enumerate(frame.columns):
+            values = frame[column].to_numpy(dtype=np.float64)
+            # the target and its shifted copies stay in double precision, they are the values forecasts are scored on
+            targetColumn = target is not None and (column == target or column.startswith(f"{target}_d+"))
+            dtype = DataPlane.storage(values, "float64" if targetColumn else precision)
+            np.save(os.path.join(path, f"{position}.npy"), values.astype(dtype))
+            dtypes.append(dtype.str)
+        index = frame.index.tz_convert("UTC").tz_localize(None) if frame.index.tz is not None else frame.index
+        np.save(os.path.join(path, "index.npy"), index.values.astype("datetime64[ns]"))
+        with open(os.path.join(path, "columns.json"), "w") as f:
+            json.dump({
+                "index": frame.index.name,
+                "tz": None if frame.index.tz is None else str(frame.index.tz),
+                "columns": list(frame.columns),
+                "dtypes": dtypes,
+            }, f)
+        rowIndex = RowIndex.build(frame["day"], frame["hour"])
+        if rowIndex is not None:
+            np.save(os.path.join(path, "rowIndex.npy"), rowIndex.positions)
+        return DataPlane(path, key, source)
+
+    @staticmethod
+    def storage(values, precision="float64"):
+        # smallest dtype holding the column exactly (dummies, hour, day, ...), the other columns in the given precision
+        finite = values[~np.isnan(values)]
+        if finite.size and np.all(finite == np.round(finite)):
+            low, high = finite.min(), finite.max()
+            if finite.size == values.size:
+                for dtype in (np.int8, np.int16, np.int32, np.int64):
+                    if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                        return np.dtype(dtype)
+            elif max(-low, high) <= 2 ** 24:
+                # integers with gaps, e.g. shifted dummies, are exact in float32
+                return np.dtype(np.float32)
+        return np.dtype(precision)
+
+    @staticmethod
+    def open(path):
+        # read only view of a plane built by another process, once per process
+        if path not in DataPlane.opened:
+            DataPlane.opened[path] = DataPlane(path)
+        return DataPlane.opened[path]
+
+    @staticmethod
+    def sweep():
+        # planes of processes that are no longer running
+        if not os.path.isdir(DataPlane.directory):
+            return
+        for name in os.listdir(DataPlane.directory):
+            pid = name.split("-")[0]
+            if pid.isdigit() and int(pid) != os.getpid() and not DataPlane.running(int(pid)):
+                shutil.rmtree(os.path.join(DataPlane.directory, name), ignore_errors=True)
+
+    @staticmethod
+    def running(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    @staticmethod
+    def releaseAll():
+        for plane in list(DataPlane.planes.values()):
+            if plane.owner != os.getpid():
+                continue
+            plane.references = 1
+            plane.release()
+
+
+atexit.register(DataPlane.releaseAll)
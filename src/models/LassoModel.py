@@ -1,13 +1,111 @@
+import numpy as np
 from sklearn import linear_model
 
 from .BaseModel import BaseModel
 
 
 class LassoModel(BaseModel):
+    cost = 20
+
+    def __init__( self,
+        predictors=[],
+        name="Model Name",
+        trainingWindow=28,
+        modelParams={},
+        internalParams={},
+        saveToFile=None,
+        engine="pool",
+        blockSize=None,
+        cache=False,
+        recalibrationEvery=1,
+        precision="float64",
+        sink=None,
+        checkpoint=None, # run directory, completed forecasts are kept there and an interrupted run resumes from them
+        warmStart=False, # keep alpha and the coefficients between the days of an (hour, horizon) series
+        reselectEvery=1, # warmStart only, select alpha on every N-th day and refit at that alpha in between
+        alphaWindow=None, # warmStart only, select alpha among the 2 * alphaWindow + 1 grid points around the previous one
+        criterion=None, # "aic" or "bic" selects alpha with LassoLarsIC instead of cross validation
+    ):
+        if warmStart:
+            self.seriesArray = LassoModel.warmArray
+        super().__init__(
+            predictors=predictors,
+            name=name,
+            trainingWindow=trainingWindow,
+            modelParams=modelParams,
+            internalParams={**internalParams, 'warmStart': warmStart, 'reselectEvery': reselectEvery, 'alphaWindow': alphaWindow, 'criterion': criterion},
+            saveToFile=saveToFile,
+            engine=engine,
+            blockSize=blockSize,
+            cache=cache,
+            recalibrationEvery=recalibrationEvery,
+            precision=precision,
+            sink=sink,
+            checkpoint=checkpoint,
+        )
+
+    def blockPeriod(self, days):
+        # alpha is selected on the first day of every block, a narrowed grid depends on the whole series before
+        if not self.internalParams['warmStart']:
+            return self.recalibrationEvery
+        if self.internalParams['alphaWindow']:
+            return days
+        return self.internalParams['reselectEvery']
+
     @staticmethod
     def one(trainX, trainY, testX, **context):
-        model = linear_model.LassoCV(**context['modelParams'])
-        model.fit(trainX, trainY.values.ravel())
+        model = LassoModel.select(trainX, trainY.values.ravel(), context)
         prediction = model.predict(testX)
         return prediction, model.coef_.tolist()
 
+    @staticmethod
+    def oneArray(trainX, trainY, testX, context):
+        return LassoModel.predictArray(LassoModel.fitArray(trainX, trainY, testX, context), testX, context)
+
+    @staticmethod
+    def fitArray(trainX, trainY, testX, context):
+        return LassoModel.select(trainX, trainY, context)
+
+    @staticmethod
+    def predictArray(model, testX, context):
+        return model.predict(testX), model.coef_.tolist()
+
+    @staticmethod
+    def warmArray(trainX, trainY, testX, context, state):
+        # alpha is selected on every reselectEvery-th day (and on the first day of a block), the days in between
+        # refit at that alpha with coordinate descent starting from the coefficients of the previous day
+        internalParams = context['internalParams']
+        day = context['dayInTestingPeriod']
+        if "model" not in state or day % internalParams['reselectEvery'] == 0:
+            selected = LassoModel.select(trainX, trainY, context, state.get("alpha"))
+            if internalParams['criterion']:
+                # LARS refits in between, LassoLarsIC can select alpha=0 (least squares) which coordinate descent handles badly
+                model = linear_model.LassoLars(alpha=selected.alpha_, **LassoModel.paramsOf(linear_model.LassoLars, context['modelParams']))
+            else:
+                model = linear_model.Lasso(alpha=selected.alpha_, warm_start=True, **LassoModel.paramsOf(linear_model.Lasso, context['modelParams']))
+            model.coef_, model.intercept_ = selected.coef_.copy(), selected.intercept_
+            state.update(model=model, alpha=selected.alpha_)
+        else:
+            model = state["model"].fit(trainX, trainY)
+        return model.predict(testX), model.coef_.tolist()
+
+    @staticmethod
+    def select(trainX, trainY, context, previousAlpha=None):
+        # fitted LassoCV, or LassoLarsIC with a criterion. With a previous alpha and an alphaWindow the CV grid is the
+        # part of the default grid (same spacing) around the previous alpha
+        internalParams, modelParams = context['internalParams'], context['modelParams']
+        if internalParams.get('criterion'):
+            params = LassoModel.paramsOf(linear_model.LassoLarsIC, modelParams)
+            return linear_model.LassoLarsIC(**{**params, "criterion": internalParams['criterion']}).fit(trainX, trainY)
+        if previousAlpha is not None and internalParams.get('alphaWindow'):
+            alphas = modelParams.get("alphas", 100)
+            ratio = modelParams.get("eps", 1e-3) ** (1 / (alphas - 1)) if isinstance(alphas, int) else np.exp(np.mean(np.diff(np.log(alphas))))
+            steps = np.arange(-internalParams['alphaWindow'], internalParams['alphaWindow'] + 1)
+            modelParams = {**modelParams, "alphas": previousAlpha * ratio ** steps}
+        return linear_model.LassoCV(**modelParams).fit(trainX, trainY)
+
+    @staticmethod
+    def paramsOf(estimator, modelParams):
+        # the modelParams the estimator accepts, the LassoCV specific ones (cv, alphas, ...) are left out
+        accepted = estimator().get_params()
+        return {key: value for key, value in modelParams.items() if key in accepted}
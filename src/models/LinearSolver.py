@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class LinearSolver:
+    # relative size of the smallest cholesky pivot below which a window is treated as rank deficient
+    rankTolerance = 1e-10
+
+    @staticmethod
+    def solve(X, y, weights=None, fitIntercept=False):
+        # X: (windows, rows, predictors), y: (windows, rows), weights: (windows, rows) or None
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y, dtype=float)
+        weights = np.ones(y.shape) if weights is None else np.asarray(weights, dtype=float)
+        if np.isnan(X).any() or np.isnan(y).any():
+            raise ValueError("Input contains NaN.")
+
+        if fitIntercept:
+            total = weights.sum(axis=1)
+            xOffset = np.einsum("bn,bnp->bp", weights, X) / total[:, None]
+            yOffset = (weights * y).sum(axis=1) / total
+            X = X - xOffset[:, None, :]
+            y = y - yOffset[:, None]
+
+        root = np.sqrt(weights)
+        coefs = LinearSolver.lstsq(X * root[..., None], y * root)
+
+        if fitIntercept:
+            return coefs, yOffset - np.einsum("bp,bp->b", xOffset, coefs)
+        return coefs, np.zeros(len(coefs))
+
+    @staticmethod
+    def lstsq(X, y):
+        gram = np.matmul(X.transpose(0, 2, 1), X)
+        moment = np.einsum("bnp,bn->bp", X, y)
+        return LinearSolver.solveNormal(gram, moment, X, y)
+
+    @staticmethod
+    def solveNormal(gram, moment, X=None, y=None):
+        coefs = np.zeros(moment.shape)
+        singular = np.ones(len(gram), dtype=bool)
+        try:
+            factor = np.linalg.cholesky(gram)
+            pivots = np.diagonal(factor, axis1=1, axis2=2) ** 2
+            scale = np.diagonal(gram, axis1=1, axis2=2).max(axis=1, initial=0)
+            singular = pivots.min(axis=1, initial=np.inf) <= LinearSolver.rankTolerance * scale
+        except np.linalg.LinAlgError:
+            pass
+
+        good = ~singular
+        if good.any():
+            z = np.linalg.solve(factor[good], moment[good][..., None])
+            coefs[good] = np.linalg.solve(factor[good].transpose(0, 2, 1), z)[..., 0]
+        if singular.any():
+            # rank deficient windows (e.g. a dummy that never fires) get the minimum norm solution, same as sklearn
+            if X is not None:
+                coefs[singular] = np.einsum("bpn,bn->bp", np.linalg.pinv(X[singular]), y[singular])
+            else:
+                coefs[singular] = np.einsum("bpq,bq->bp", np.linalg.pinv(gram[singular], hermitian=True), moment[singular])
+        return coefs
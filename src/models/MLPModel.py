@@ -1,4 +1,7 @@
+import math
+import numbers
 import numpy as np
+from scipy.special import expit
 from sklearn.neural_network import MLPRegressor
 from .BaseModel import BaseModel
 from sklearn.experimental import enable_halving_search_cv
@@ -6,8 +9,12 @@ from sklearn.model_selection import HalvingRandomSearchCV
 from scipy.stats import uniform
 from sklearn.base import BaseEstimator, RegressorMixin
 from .ModelWorker import ModelWorker
-from functools import partial
+from ..results.ColumnarResults import ColumnarResults
+import pandas as pd
+import multiprocessing as mp
 import optuna
+from rich import print
+from .ModelScheduler import ModelScheduler
 #Wrapper for MLP regressor to implement committee of models
 class MLPCommittee(BaseEstimator, RegressorMixin):
     def __init__(self, n_members=5, **mlp_params):
@@ -23,6 +30,14 @@ class MLPCommittee(BaseEstimator, RegressorMixin):
             self.models_.append(model)
         return self
 
+    def refit(self, X, y, max_iter):
+        # continues training the fitted members for at most max_iter more iterations, with a new optimizer as
+        # MLPRegressor does with warm_start
+        for model in self.models_:
+            model.set_params(warm_start=True, max_iter=max_iter)
+            model.fit(X, y)
+        return self
+
     def predict(self, X):
         if not self.models_:
             raise Exception("The model has not been fitted yet.")
@@ -50,49 +65,255 @@ class MLPCommittee(BaseEstimator, RegressorMixin):
         self.mlp_params.update(child_params)
         return super().set_params(**self_params)
 
+class StackedMLPCommittee(MLPCommittee):
+    # the members trained at once as (members, ...) stacked weights of one architecture with different initialisations,
+    # following MLPRegressor for the adam and constant sgd solvers: glorot initialisation, L2 penalty, shuffled mini
+    # batches and stopping on the training loss, every member on its own. Other setups fall back to sklearn members
+    activations = {
+        "identity": (lambda z: z, lambda a: 1.0),
+        "logistic": (expit, lambda a: a * (1 - a)),
+        "tanh": (np.tanh, lambda a: 1 - a ** 2),
+        "relu": (lambda z: np.maximum(z, 0), lambda a: (a > 0).astype(a.dtype)),
+    }
+
+    def fit(self, X, y):
+        params = {**MLPRegressor().get_params(), **self.mlp_params}
+        self.models_, self.coefs_, self.intercepts_ = [], None, None
+        if not StackedMLPCommittee.supports(params):
+            return super().fit(X, y)
+        X, y = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64).reshape(len(X))
+        self.random_ = rng = np.random.default_rng(params["random_state"])
+        hidden = params["hidden_layer_sizes"]
+        sizes = [X.shape[1], *([hidden] if isinstance(hidden, numbers.Integral) else hidden), 1]
+        # glorot uniform as in MLPRegressor
+        bounds = [np.sqrt((2.0 if params["activation"] == "logistic" else 6.0) / (fanIn + fanOut)) for fanIn, fanOut in zip(sizes[:-1], sizes[1:])]
+        self.coefs_ = [rng.uniform(-bound, bound, (self.n_members, fanIn, fanOut)) for bound, fanIn, fanOut in zip(bounds, sizes[:-1], sizes[1:])]
+        self.intercepts_ = [rng.uniform(-bound, bound, (self.n_members, 1, fanOut)) for bound, fanOut in zip(bounds, sizes[1:])]
+        self.train(X, y, params, rng)
+        return self
+
+    def refit(self, X, y, max_iter):
+        if self.coefs_ is None:
+            return super().refit(X, y, max_iter)
+        params = {**MLPRegressor().get_params(), **self.mlp_params, "max_iter": max_iter}
+        X, y = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64).reshape(len(X))
+        return self.train(X, y, params, self.random_)
+
+    def train(self, X, y, params, rng):
+        activation, derivative = StackedMLPCommittee.activations[params["activation"]]
+        members, samples = self.n_members, len(X)
+        batchSize = min(200, samples) if params["batch_size"] == "auto" else int(np.clip(params["batch_size"], 1, samples))
+        weights = self.coefs_ + self.intercepts_
+        layers = len(self.coefs_)
+        moments = [np.zeros_like(weight) for weight in weights]
+        velocities = [np.zeros_like(weight) for weight in weights]
+        active = np.ones(members, dtype=bool)
+        bestLoss, stalled = np.full(members, np.inf), np.zeros(members, dtype=int)
+        step = 0
+        rows = np.tile(np.arange(samples), (members, 1))
+        self.n_iter_ = np.zeros(members, dtype=int)
+        for _ in range(params["max_iter"]):
+            if params["shuffle"]:
+                rows = rng.permuted(rows, axis=1)
+            loss = np.zeros(members)
+            for start in range(0, samples, batchSize):
+                batch = rows[:, start:start + batchSize]
+                outputs = [X[batch]]
+                for i in range(layers):
+                    z = outputs[-1] @ self.coefs_[i] + self.intercepts_[i]
+                    outputs.append(z if i == layers - 1 else activation(z))
+                delta = outputs[-1] - y[batch][..., None]
+                penalty = sum(np.einsum("mij,mij->m", coef, coef) for coef in self.coefs_)
+                loss += (np.mean(delta[..., 0] ** 2, axis=1) / 2 + params["alpha"] * penalty / (2 * batch.shape[1])) * batch.shape[1]
+                gradients = [None] * (2 * layers)
+                for i in range(layers - 1, -1, -1):
+                    gradients[i] = (np.swapaxes(outputs[i], 1, 2) @ delta + params["alpha"] * self.coefs_[i]) / batch.shape[1]
+                    gradients[layers + i] = delta.mean(axis=1, keepdims=True)
+                    if i > 0:
+                        delta = (delta @ np.swapaxes(self.coefs_[i], 1, 2)) * derivative(outputs[i])
+                step += 1
+                mask = active[:, None, None]
+                if params["solver"] == "adam":
+                    rate = params["learning_rate_init"] * np.sqrt(1 - params["beta_2"] ** step) / (1 - params["beta_1"] ** step)
+                    for weight, gradient, moment, velocity in zip(weights, gradients, moments, velocities):
+                        moment *= params["beta_1"]
+                        moment += (1 - params["beta_1"]) * gradient
+                        velocity *= params["beta_2"]
+                        velocity += (1 - params["beta_2"]) * gradient ** 2
+                        weight -= mask * rate * moment / (np.sqrt(velocity) + params["epsilon"])
+                else:
+                    rate = params["learning_rate_init"]
+                    for weight, gradient, velocity in zip(weights, gradients, velocities):
+                        velocity *= params["momentum"]
+                        velocity -= rate * gradient
+                        update = params["momentum"] * velocity - rate * gradient if params["nesterovs_momentum"] else velocity
+                        weight += mask * update
+            loss /= samples
+            self.n_iter_ += active
+            # no improvement bookkeeping of MLPRegressor, per member
+            stalled = np.where(loss > bestLoss - params["tol"], stalled + 1, 0)
+            bestLoss = np.minimum(bestLoss, loss)
+            active &= stalled <= params["n_iter_no_change"]
+            if not active.any():
+                break
+        return self
+
+    def predict(self, X):
+        if self.coefs_ is None:
+            return super().predict(X)
+        activation, _ = StackedMLPCommittee.activations[self.mlp_params.get("activation", "relu")]
+        output = np.asarray(X, dtype=np.float64)[None]
+        for i, (coef, intercept) in enumerate(zip(self.coefs_, self.intercepts_)):
+            output = output @ coef + intercept
+            if i < len(self.coefs_) - 1:
+                output = activation(output)
+        return output[..., 0].mean(axis=0)
+
+    @staticmethod
+    def supports(params):
+        return (
+            (params["solver"] == "adam" or (params["solver"] == "sgd" and params["learning_rate"] == "constant"))
+            and params["loss"] == "squared_error"
+            and not params["early_stopping"]
+            and (params["random_state"] is None or isinstance(params["random_state"], numbers.Integral))
+        )
+
+
+class TrialReport:
+    # running MAE of a trial backtest, reported to Optuna for every day once all its forecasts arrived
+    def __init__(self, trial, horizon):
+        self.trial = trial
+        self.perDay = horizon * 24
+        self.counts = {}
+        self.errors = {}
+        self.total = 0.0
+        self.day = 0
+        self.pruned = False
+
+    def add(self, job, block):
+        for result in block:
+            day = result["dayInTestingPeriod"]
+            self.counts[day] = self.counts.get(day, 0) + 1
+            self.errors[day] = self.errors.get(day, 0.0) + abs(result["value"] - result["prediction"])
+        while not self.pruned and self.counts.get(self.day) == self.perDay:
+            self.total += self.errors[self.day]
+            self.trial.report(self.total / ((self.day + 1) * self.perDay), self.day)
+            self.day += 1
+            if self.trial.should_prune():
+                self.pruned = job["cancelled"] = True
+
+
 class MLPModel(BaseModel):
+    cost = 200
+    studyParams = ("trials", "parallelTrials", "studyStorage", "pruner")
+
     def __init__( self,
         predictors=[],
         name="Model Name",
         trainingWindow=28,
         modelParams={},
         committee=5,
+        stacked=False, # train the committee members at once in NumPy (StackedMLPCommittee) instead of one sklearn MLP after another
         hyperparamOptimization=False, #cv, number meaning calibration window
         cvCount=5,
+        trials=1, # calibration window only, number of Optuna trials
+        parallelTrials=1, # calibration window only, trials run at the same time in one pool
+        studyStorage=None, # calibration window only, journal file of the study, an interrupted study resumes from it
+        pruner=None, # calibration window only, Optuna pruner of the study (MedianPruner by default), NopPruner disables pruning
+        searchEvery=None, # cv only, search the hyperparameters of an (hour, horizon) series every N days and fit with them in between
         saveToFile=None,
+        blockSize=None,
+        cache=False,
+        recalibrationEvery=1,
+        precision="float64",
+        sink=None,
+        checkpoint=None, # run directory, completed forecasts are kept there and an interrupted run resumes from them
+        warmStart=False, # continue training the committee of the previous day of an (hour, horizon) series
+        warmIterations=50, # warmStart only, iterations of the continued training
+        reinitializeEvery=7, # warmStart only, train a new committee from a random initialisation every N days
     ):
+        if warmStart or (hyperparamOptimization == 'cv' and searchEvery):
+            self.seriesArray = MLPModel.warmArray
         super().__init__(
             predictors=predictors,
             name=name,
             trainingWindow=trainingWindow,
             modelParams=modelParams,
             saveToFile=saveToFile,
-            internalParams={'committee': committee, 'hyperparamOptimization': hyperparamOptimization, 'cvCount': cvCount}
+            internalParams={
+                'committee': committee, 'stacked': stacked, 'hyperparamOptimization': hyperparamOptimization, 'cvCount': cvCount, 'searchEvery': searchEvery,
+                'trials': trials, 'parallelTrials': parallelTrials, 'studyStorage': studyStorage, 'pruner': pruner,
+                'warmStart': warmStart, 'warmIterations': warmIterations, 'reinitializeEvery': reinitializeEvery,
+            },
+            blockSize=blockSize,
+            cache=cache,
+            recalibrationEvery=recalibrationEvery,
+            precision=precision,
+            sink=sink,
+            checkpoint=checkpoint,
         )
 
     def beforeHook(self, horizon, data, testPeriodStart, testPeriodEnd, datasetOffset, testingWindow, target="load"):
      
         if type(self.internalParams.get('hyperparamOptimization'))==int:
-            study = optuna.create_study()
-            objective = partial(MLPModel.optimizationObjective,
-                                horizon=horizon,
-                                data=data,
-                                testPeriodStart=data[data['day'] == datasetOffset-self.internalParams.get('hyperparamOptimization')].index_col[0].strftime('%Y-%m-%d'),
-                                testPeriodEnd=testPeriodStart,
-                                target=target,
-                                predictors=self.predictors,
-                                trainingWindow=self.trainingWindow,
-                                modelParams=self.modelParams,
-                                name=self.name
-                                )
+            calibrationStart = data[data['day'] == datasetOffset-self.internalParams.get('hyperparamOptimization')].index[0].strftime('%Y-%m-%d')
             self.internalParams['hyperparamOptimization']=False
-            study.optimize(objective, n_trials=1,n_jobs=1)
-            self.modelParams = study.best_params
+            study = self.optimize(horizon, data, calibrationStart, testPeriodStart, target)
+            if not study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)):
+                print("[yellow]Optimization found no complete trial, keeping the given params")
+                return
+            self.modelParams = {**self.modelParams, **MLPModel.trialParams(study.best_params)}
             print(f"[green]Optimization complete. Best params: {study.best_params}")
-        
+
+    def optimize(self, horizon, data, testPeriodStart, testPeriodEnd, target):
+        # the trials run parallelTrials at a time as the models of one ModelScheduler run, all on one pool. data is the
+        # preprocessed frame of the run, so the trials read its data plane. With a studyStorage journal file an
+        # interrupted study resumes where it stopped. Every trial reports its running MAE after each day of the
+        # backtest, so the pruner stops hopeless trials early
+        internalParams = self.internalParams
+        storage = None
+        if internalParams['studyStorage']:
+            storage = optuna.storages.JournalStorage(optuna.storages.journal.JournalFileBackend(internalParams['studyStorage']))
+        study = optuna.create_study(study_name=self.name, storage=storage, pruner=internalParams['pruner'], load_if_exists=True)
+        for trial in study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.RUNNING,)):
+            # trials of an interrupted study, the study is not meant to be shared by several processes
+            study.tell(trial.number, state=optuna.trial.TrialState.FAIL)
+        finished = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+        with mp.Pool(processes=BaseModel.processes(), initializer=ModelWorker.initialize, initargs=({},)) as pool:
+            while (done := len(study.get_trials(deepcopy=False, states=finished))) < internalParams['trials']:
+                trials = [study.ask() for _ in range(min(internalParams['parallelTrials'], internalParams['trials'] - done))]
+                models = [self.trialModel(trial) for trial in trials]
+                reports = {model: TrialReport(trial, horizon) for model, trial in zip(models, trials)}
+                outputs = ModelScheduler.run(
+                    models, horizon, data, testPeriodStart, testPeriodEnd, target, pool=pool,
+                    onBlock=lambda job, block: reports[job["model"]].add(job, block),
+                )
+                for model, trial, results in zip(models, trials, outputs):
+                    if reports[model].pruned:
+                        study.tell(trial, state=optuna.trial.TrialState.PRUNED)
+                        continue
+                    results = ColumnarResults.of(results)
+                    study.tell(trial, float(np.mean(np.abs(results.column('value') - results.column('prediction')))))
+        return study
+
+    def trialModel(self, trial):
+        return MLPModel(
+            predictors=self.predictors,
+            trainingWindow=self.trainingWindows or self.trainingWindow,
+            name=f"{self.name} trial #{trial.number}",
+            # one day per task, the results arrive day by day
+            blockSize=1,
+            modelParams=MLPModel.suggest(trial, self.modelParams),
+            committee=self.internalParams['committee'],
+            stacked=self.internalParams['stacked'],
+            precision=self.precision,
+        )
+
     @staticmethod
-    def optimizationObjective(trial, horizon, data, testPeriodStart, testPeriodEnd, target, predictors, trainingWindow, modelParams,name):
-        modelParams['hidden_layer_sizes'] = modelParams.get('hidden_layer_sizes') or trial.suggest_categorical('hidden_layer_sizes', [(5,), (10,), (5,5), (10,5), (10,10)])
+    def suggest(trial, modelParams):
+        # the modelParams of a trial, the ones given by the user are kept
+        modelParams = dict(modelParams)
+        modelParams['hidden_layer_sizes'] = modelParams.get('hidden_layer_sizes') or MLPModel.layers(trial.suggest_categorical('hidden_layer_sizes', ['5', '10', '5-5', '10-5', '10-10']))
         modelParams['solver'] = modelParams.get('solver') or trial.suggest_categorical('solver', ['adam', 'sgd', 'lbfgs'])
         modelParams['activation'] = modelParams.get('activation') or trial.suggest_categorical('activation', ['relu', 'tanh', 'logistic'])
         modelParams['alpha'] = modelParams.get('alpha') or trial.suggest_float('alpha', 0.0001, 0.01)
@@ -100,21 +321,33 @@ class MLPModel(BaseModel):
             modelParams['max_iter'] = modelParams.get('max_iter') or trial.suggest_categorical('max_iter', [500, 1000, 5000, 10000, 20000])
         else:   
             modelParams['learning_rate_init'] = modelParams.get('learning_rate_init') or trial.suggest_float('learning_rate_init', 0.001, 0.1)
-        model = MLPModel(predictors=predictors, trainingWindow=trainingWindow, name=f"{name} trial #{trial.number}", modelParams=modelParams,hyperparamOptimization=False)
-        results = model.run(horizon, data, testPeriodStart, testPeriodEnd, target)
-        errors = [abs(res['value'] - res['prediction']) for res in results]
-        return np.mean(errors)
+        return modelParams
 
-            
+    @staticmethod
+    def trialParams(params):
+        # best_params of a study as modelParams, the layer sizes are stored as strings (e.g. "10-5") in the study
+        if 'hidden_layer_sizes' in params:
+            params = {**params, 'hidden_layer_sizes': MLPModel.layers(params['hidden_layer_sizes'])}
+        return params
 
+    @staticmethod
+    def layers(value):
+        return tuple(int(size) for size in value.split('-'))
 
     @staticmethod
     def one(trainX, trainY, testX, **context):
-        
+        return MLPModel.oneArray(trainX, trainY.values.ravel(), testX, context)
+
+    @staticmethod
+    def oneArray(trainX, trainY, testX, context):
+        return MLPModel.predictArray(MLPModel.fitArray(trainX, trainY, testX, context), testX, context)
+
+    @staticmethod
+    def fitArray(trainX, trainY, testX, context):
         initial_params = context.get('modelParams', {}).copy()
         initial_params['n_members'] = context['internalParams'].get('committee', 5)
         
-        model = MLPCommittee(**initial_params)
+        model = (StackedMLPCommittee if context['internalParams'].get('stacked') else MLPCommittee)(**initial_params)
 
         if context['internalParams'].get('hyperparamOptimization', False)=='cv':
             params = [
@@ -141,14 +374,65 @@ class MLPModel(BaseModel):
                 n_jobs=1
             )
 
-            search.fit(trainX, trainY.values.ravel())
-            best = search.best_estimator_
-            prediction = best.predict(testX)
-            return prediction, best.get_params()  
+            search.fit(trainX, trainY)
+            return search.best_estimator_
+
+        return model.fit(trainX, trainY)
+
+    @staticmethod
+    def warmArray(trainX, trainY, testX, context, state):
+        # searchEvery: the hyperparameters are searched on every searchEvery-th day (and the first day of a block),
+        # the days in between fit a committee with the ones found. warmStart: a new committee on every
+        # reinitializeEvery-th day, the days in between continue training the committee of the previous day
+        internalParams = context['internalParams']
+        day = context['dayInTestingPeriod']
+        searchEvery = internalParams['searchEvery'] if internalParams['hyperparamOptimization'] == 'cv' else None
+        if searchEvery and ("searched" not in state or day % searchEvery == 0):
+            state["model"] = MLPModel.fitArray(trainX, trainY, testX, context)
+            state["searched"] = dict(state["model"].mlp_params)
+            state["record"] = {"searchDay": day}
+        elif not internalParams['warmStart'] or "model" not in state or day % internalParams['reinitializeEvery'] == 0:
+            if searchEvery:
+                context = {
+                    **context,
+                    "modelParams": {**context['modelParams'], **state["searched"]},
+                    "internalParams": {**internalParams, "hyperparamOptimization": False},
+                }
+            state["model"] = MLPModel.fitArray(trainX, trainY, testX, context)
         else:
-            model.fit(trainX, trainY.values.ravel())
-            prediction = model.predict(testX)
+            state["model"].refit(trainX, trainY, internalParams['warmIterations'])
+        return MLPModel.predictArray(state["model"], testX, context)
 
+    def blockPeriod(self, days):
+        # blocks start on search and reinitialisation days
+        periods = [self.recalibrationEvery]
+        if self.internalParams['hyperparamOptimization'] == 'cv' and self.internalParams['searchEvery']:
+            periods.append(self.internalParams['searchEvery'])
+        if self.internalParams['warmStart']:
+            periods.append(self.internalParams['reinitializeEvery'])
+        return math.lcm(*periods)
 
-        
-        return prediction, model.get_params()
\ No newline at end of file
+    @staticmethod
+    def searchSummary(results):
+        # one row per hyperparameter search of a searchEvery run: its (hour, horizon) series, day, date and the chosen
+        # hyperparameters, in the order of the days
+        summaries = []
+        for part in ColumnarResults.parts(results):
+            if "searchDay" not in part.columns:
+                continue
+            rows = np.flatnonzero(part.column("searchDay") == part.column("dayInTestingPeriod"))
+            summary = pd.DataFrame({
+                "hour": part.column("hour")[rows],
+                "horizon": part.column("horizon")[rows],
+                "searchDay": part.column("searchDay")[rows],
+                "date": [ColumnarResults.value(part.column("date"), row) for row in rows],
+            })
+            params = pd.DataFrame([{key: value for key, value in part.column("coefs")[row].items() if key != "n_members"} for row in rows])
+            summaries.append(pd.concat([summary, params], axis=1))
+        if not summaries:
+            return pd.DataFrame(columns=["hour", "horizon", "searchDay", "date"])
+        return pd.concat(summaries, ignore_index=True).sort_values(["searchDay", "horizon", "hour"], ignore_index=True)
+
+    @staticmethod
+    def predictArray(model, testX, context):
+        return model.predict(testX), model.get_params()
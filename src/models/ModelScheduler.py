@@ -0,0 +1,66 @@
+import heapq
+import itertools
+import multiprocessing as mp
+from rich.progress import Progress
+from .BaseModel import BaseModel
+from .ModelWorker import ModelWorker
+
+
+class ModelScheduler:
+    # runs the pool tasks of several models in one long lived pool, interleaved and the most expensive tasks first,
+    # models on an in process engine (batched, recursive) run in the main process meanwhile
+    @staticmethod
+    def run(models, horizon, data, testPeriodStart, testPeriodEnd, target="load", pool=None, onBlock=None):
+        # pool: a pool shared with other runs (e.g. the trials of a study), the tasks then carry their run.
+        # onBlock(job, block) is called for every collected block, setting job["cancelled"] stops its next tasks
+        with BaseModel.terminating():
+            jobs = []
+            try:
+                for model in models:
+                    jobs.append(model.prepare(horizon, data, testPeriodStart, testPeriodEnd, target))
+                outputs = [None] * len(jobs)
+                runs = {job["key"]: job["run"] for job in jobs if job["tasks"] is not None}
+
+                def finishInProcess():
+                    for position, job in enumerate(jobs):
+                        if job["tasks"] is None:
+                            outputs[position] = job["model"].finish(job)
+
+                if runs and pool is not None:
+                    ModelScheduler.execute(pool, jobs, finishInProcess, shipRuns=True, onBlock=onBlock)
+                elif runs:
+                    with mp.Pool(processes=BaseModel.processes(), initializer=ModelWorker.initialize, initargs=(runs,)) as pool:
+                        ModelScheduler.execute(pool, jobs, finishInProcess, onBlock=onBlock)
+                for position, job in enumerate(jobs):
+                    if outputs[position] is None:
+                        outputs[position] = job["model"].finish(job)
+                return outputs
+            finally:
+                for job in jobs:
+                    job["model"].release(job)
+
+    @staticmethod
+    def execute(pool, jobs, meanwhile, shipRuns=False, onBlock=None):
+        pooled = [job for job in jobs if job["tasks"] is not None]
+        tasks = ModelScheduler.order(jobs)
+        if shipRuns:
+            tasks = ((job, task + (job["run"],)) for job, task in tasks)
+        with Progress() as progress:
+            bar = progress.add_task(f"[magenta]Running {len(pooled)} models", total=sum(job["forecasts"] for job in pooled))
+            for job, block in BaseModel.feed(pool, tasks, meanwhile):
+                job["model"].collect(job, block)
+                if onBlock is not None:
+                    onBlock(job, block)
+                progress.update(bar, completed=sum(job["done"] for job in pooled))
+
+    @staticmethod
+    def order(jobs):
+        # (job, task) pairs of all jobs, longest first. The tasks of one job cost about the same, so merging the
+        # generators of the jobs by cost keeps them lazy. Jobs of the same cost (e.g. the trials of a study) take
+        # turns, the position of a task in its job breaks the ties
+        merged = heapq.merge(
+            *(zip(itertools.repeat(job), itertools.count(), job["tasks"]) for job in jobs if job["tasks"] is not None),
+            key=lambda item: (item[0]["model"].taskCost(item[2][2]), -item[1]),
+            reverse=True,
+        )
+        return ((job, task) for job, _, task in merged)
@@ -1,14 +1,239 @@
 from ..scalers.StandardScaler import StandardScaler
+import copy
+import signal
 import numpy as np
-from multiprocessing import shared_memory
-import pandas as pd
+from .RecursiveLeastSquares import RecursiveLeastSquares
+from .DataPlane import DataPlane
+from ..results.ColumnarResults import ColumnarResults
 
 class ModelWorker:
+    # runs attached in this process by the pool initializer, keyed by job
+    runs = {}
+
+    @staticmethod
+    def initialize(runs):
+        # pool initializer, attaches the shared data of every run once per worker process
+        # workers are stopped by the pool, the SIGTERM handler of the main process must not run in them
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for key, run in runs.items():
+            ModelWorker.attach(key, run)
+
+    @staticmethod
+    def attach(key, run):
+        # the columns are mapped as the tasks read them
+        plane = DataPlane.open(run["data"]["plane"])
+        ModelWorker.runs[key] = {
+            **run,
+            "plane": plane,
+            "positions": plane.positions,
+            "rowIndex": plane.rowIndex,
+        }
+
+    @staticmethod
+    def blockWorker(args):
+        # one task per (days, hour, horizon) block of an attached run, the days are forecasted locally
+        key, block, days = args[:3]
+        if key not in ModelWorker.runs:
+            # tasks on a pool shared by several runs carry their run
+            ModelWorker.attach(key, args[3])
+        run = ModelWorker.runs[key]
+        if run.get("recalibrationEvery", 1) > 1:
+            fitted = {}
+            return [ModelWorker.forecastRecalibrated(run, ModelWorker.context(run, block, day), block["columns"], fitted) for day in days]
+        if run["context"].get("trainingWindows"):
+            return ModelWorker.forecastWindows(run, block, days)
+        if run.get("seriesModel") is not None:
+            state = {}
+            return [ModelWorker.forecastSeries(run, window, state) for window in ModelWorker.blockWindows(run, block, days)]
+        if run.get("arrayModel") is not None:
+            return [ModelWorker.forecastArray(run, window) for window in ModelWorker.blockWindows(run, block, days)]
+        return [
+            ModelWorker.forecast(run["plane"].frame, run["rowIndex"], ModelWorker.context(run, block, day), run["model"], run["scaler"])
+            for day in days
+        ]
+
+    @staticmethod
+    def context(run, block, dayInTestingPeriod):
+        return {
+            "hour": block["hour"],
+            "dayInTestingPeriod": dayInTestingPeriod,
+            "datasetOffset": run["context"]["datasetOffset"],
+            "horizon": block["horizon"],
+            "trainingWindow": run["context"]["trainingWindow"],
+            "modelParams": run["context"]["modelParams"],
+            "internalParams": run["context"]["internalParams"],
+            "target": block["target"],
+            "predictors": block["predictors"],
+        }
+
+    @staticmethod
+    def forecastArray(run, window):
+        # same as forecast, on a scaled window of blockWindows, no DataFrames are built
+        context, trainX, trainY, testX, testRow, (yCenter, yScale) = window
+        prediction, params = run["arrayModel"](trainX, trainY, testX, context)
+        return ModelWorker.arrayRecord(run, context, testRow, np.ravel(prediction) * yScale + yCenter, testX, params)
+
+    @staticmethod
+    def forecastSeries(run, window, state):
+        # same as forecastArray, the kernel also gets the state of the previous days of the block
+        context, trainX, trainY, testX, testRow, (yCenter, yScale) = window
+        prediction, params = run["seriesModel"](trainX, trainY, testX, context, state)
+        # fields the kernel keeps in state["record"] go into every record, e.g. the day of a search
+        return {**ModelWorker.arrayRecord(run, context, testRow, np.ravel(prediction) * yScale + yCenter, testX, params), **state.get("record", {})}
+
+    @staticmethod
+    def blockWindows(run, block, days):
+        # (context, trainX, trainY, testX, testRow, (yCenter, yScale)) of every day of a block, scaled. The rows of the
+        # (hour, horizon) series are gathered once, the windows are slices of them and their scaling comes from cumulative sums
+        plane, context = run["plane"], ModelWorker.context(run, block, days[0])
+        rows, starts, stops, tests = ModelWorker.seriesWindows(plane, block["hour"], days, context["datasetOffset"], block["horizon"], context["trainingWindow"], run["rowIndex"])
+        first = starts.min()
+        rows, starts, stops, tests = rows[first:tests.max() + 1], starts - first, stops - first, tests - first
+        X = plane.take(rows, block["columns"])
+        y = plane.column(plane.positions[block["target"]])[rows].astype(np.float64)
+        center, scale, yCenter, yScale = copy.copy(run["scaler"]).fitSeries(
+            X, y, starts, stops, ModelWorker.distinct(run, block["columns"]), block["predictors"], block["target"]
+        )
+        for i, day in enumerate(days):
+            trainX = (X[starts[i]:stops[i]] - center[i]) / scale[i]
+            trainY = (y[starts[i]:stops[i]] - yCenter[i]) / yScale[i]
+            testX = ((X[tests[i]] - center[i]) / scale[i])[None]
+            yield ModelWorker.context(run, block, day), trainX, trainY, testX, rows[tests[i]], (yCenter[i], yScale[i])
+
+    @staticmethod
+    def forecastWindows(run, block, days):
+        # every day of a block fitted on each of several training windows. The windows of a day end on the same row, are
+        # slices of one gathered series and are scaled on their own. With a normalArray kernel the cross products of the
+        # nested windows are summed once, from the shortest window to the longest. Records keep the forecast of every
+        # window, the prediction is their average, testX and coefs are the ones of the longest window
+        plane, windows = run["plane"], run["context"]["trainingWindows"]
+        context = ModelWorker.context(run, block, days[0])
+        series = [ModelWorker.seriesWindows(plane, block["hour"], days, context["datasetOffset"], block["horizon"], window, run["rowIndex"]) for window in windows]
+        rows, _, stops, tests = series[-1]
+        starts = np.minimum([windowStarts for _, windowStarts, _, _ in series], stops)
+        first = starts.min()
+        rows, starts, stops, tests = rows[first:tests.max() + 1], starts - first, stops - first, tests - first
+        X = plane.take(rows, block["columns"])
+        y = plane.column(plane.positions[block["target"]])[rows].astype(np.float64)
+        unique = ModelWorker.distinct(run, block["columns"])
+        center, scale, yCenter, yScale = (np.stack(values) for values in zip(*(
+            copy.copy(run["scaler"]).fitSeries(X, y, windowStarts, stops, unique, block["predictors"], block["target"]) for windowStarts in starts
+        )))
+        normal = run.get("normalModel")
+        if normal is not None:
+            # the rows after the last training row are test rows, their targets can be unknown (NaN)
+            trainX, trainY = X[starts.min():stops.max()], y[starts.min():stops.max()]
+            if np.isnan(trainX).any() or np.isnan(trainY).any():
+                raise ValueError(f"Input data for hour {block['hour']} and horizon {block['horizon']} contains NaN.")
+            shift, yShift = trainX.mean(axis=0), trainY.mean()
+            Z, w = X - shift, y - yShift
+        states = [{} for _ in windows]
+
+        results = []
+        for i, day in enumerate(days):
+            context = ModelWorker.context(run, block, day)
+            testX = (X[tests[i]] - center[:, i]) / scale[:, i]
+            if normal is not None:
+                n, sz, szz, sw, szw = 0, 0, 0, 0, 0
+                grams, moments, end = [], [], stops[i]
+                for k in range(len(windows)):
+                    Zs, ws = Z[starts[k, i]:end], w[starts[k, i]:end]
+                    n, sz, szz, sw, szw = n + len(Zs), sz + Zs.sum(axis=0), szz + Zs.T @ Zs, sw + ws.sum(), szw + Zs.T @ ws
+                    gram, moment = RecursiveLeastSquares.scaledEquations(n, sz, szz, sw, szw, center[k, i] - shift, scale[k, i], yCenter[k, i] - yShift, yScale[k, i])
+                    grams.append(gram)
+                    moments.append(moment)
+                    end = starts[k, i]
+                predictions, params = normal(np.array(grams), np.array(moments), testX, context)
+                params = np.asarray(params).tolist()
+            else:
+                predictions, params = [], []
+                for k in range(len(windows)):
+                    trainX = (X[starts[k, i]:stops[i]] - center[k, i]) / scale[k, i]
+                    trainY = (y[starts[k, i]:stops[i]] - yCenter[k, i]) / yScale[k, i]
+                    if run.get("seriesModel") is not None:
+                        prediction, windowParams = run["seriesModel"](trainX, trainY, testX[k][None], context, states[k])
+                    else:
+                        prediction, windowParams = run["arrayModel"](trainX, trainY, testX[k][None], context)
+                    predictions.append(np.ravel(prediction)[0])
+                    params.append(windowParams)
+            predictions = np.asarray(predictions) * yScale[:, i] + yCenter[:, i]
+            record = ModelWorker.arrayRecord(run, context, rows[tests[i]], [predictions.mean()], testX[-1:], params[-1])
+            results.append({**record, "trainingWindows": windows, "windowPredictions": predictions.tolist(), **states[-1].get("record", {})})
+        return results
+
+    @staticmethod
+    def distinct(run, columns):
+        # distinct values of every column over the whole data, counted once per process and run. Columns with at most
+        # 2 of them are dummies in every window, the scaler checks the other columns window by window
+        counts = run.setdefault("distinct", {})
+        for position in columns:
+            if position not in counts:
+                values = run["plane"].column(position)
+                counts[position] = len(np.unique(values[np.isfinite(values)]))
+        return np.array([counts[position] for position in columns])
+
     @staticmethod
-    def worker(args):
-        context, inMemoryData, model, scaler = args
-        data, sharedMemory = ModelWorker.getDataFromSharedMemory(inMemoryData)
-        test, train = ModelWorker.extractTrainAndTest(data, context["hour"], context["dayInTestingPeriod"],  context["datasetOffset"], context['horizon'], context['trainingWindow'])
+    def forecastRecalibrated(run, context, columns, fitted):
+        # fits only on every recalibrationEvery-th day of the testing period, the days in between reuse
+        # the estimator and the scaling of the last fit, kept in fitted between the days of a block
+        day = context["dayInTestingPeriod"]
+        fitDay = day - day % run["recalibrationEvery"]
+        if fitted.get("day") != fitDay or fitted.get("columns") != columns:
+            fitContext = {**context, "dayInTestingPeriod": fitDay}
+            trainX, trainY, testX, _ = ModelWorker.windowArrays(run, fitContext, columns)
+            scaler = copy.copy(run["scaler"])
+            trainX, trainY = scaler.fitBatch(trainX[None], trainY[None], context['predictors'], context['target'])
+            estimator = run["fitModel"](trainX[0], trainY[0], scaler.applyBatch(testX), fitContext)
+            fitted.update(day=fitDay, columns=columns, scaler=scaler, estimator=estimator)
+
+        plane = run["plane"]
+        testRow = ModelWorker.windowRows(plane, run["rowIndex"], context["hour"], context["datasetOffset"] + day, context["datasetOffset"] + day)[-1]
+        testX = fitted["scaler"].applyBatch(plane.take([testRow], columns))
+        prediction, params = run["predictModel"](fitted["estimator"], testX, context)
+        prediction = fitted["scaler"].inverseBatch(np.ravel(prediction))
+        return {**ModelWorker.arrayRecord(run, context, testRow, prediction, testX, params), "fitDay": fitDay}
+
+    @staticmethod
+    def windowArrays(run, context, columns):
+        plane = run["plane"]
+        rows = ModelWorker.windowRows(plane, run["rowIndex"], context["hour"], context["datasetOffset"] - context['trainingWindow'] - context['horizon'] + context["dayInTestingPeriod"], context["datasetOffset"] + context["dayInTestingPeriod"])
+        trainRows, testRow = rows[:-1 - context['horizon']], rows[-1]
+        trainX = plane.take(trainRows, columns)
+        trainY = plane.column(plane.positions[context['target']])[trainRows].astype(np.float64)
+        testX = plane.take([testRow], columns)
+        return trainX, trainY, testX, testRow
+
+    @staticmethod
+    def arrayRecord(run, context, testRow, prediction, testX, params):
+        context = {key: value for key, value in context.items() if key != 'internalParams'}
+        return {
+            "date": str(np.datetime_as_string(run["plane"].index.values[testRow], unit='D')),
+            **context,
+            "prediction": float(prediction[0]),
+            "value": float(run["plane"].column(run["positions"][context['target']])[testRow]),
+            "testX": testX[0].tolist(),
+            "coefs": params,
+        }
+
+    @staticmethod
+    def windowRows(data, rowIndex, hour, firstDay, lastDay):
+        # data: anything with day and hour columns (DataFrame, DataPlane)
+        if rowIndex is not None:
+            return rowIndex.window(hour, firstDay, lastDay)
+        day = ModelWorker.columnValues(data, "day")
+        return np.flatnonzero((ModelWorker.columnValues(data, "hour") == hour) & (day >= firstDay) & (day <= lastDay))
+
+    @staticmethod
+    def columnValues(data, column):
+        if isinstance(data, DataPlane):
+            return data.column(data.positions[column])
+        return data[column].to_numpy()
+
+    @staticmethod
+    def forecast(data, rowIndex, context, model, scaler):
+        test, train = ModelWorker.extractTrainAndTest(data, context["hour"], context["dayInTestingPeriod"],  context["datasetOffset"], context['horizon'], context['trainingWindow'], rowIndex)
+        # compact columns of the data plane back to float64, the scaler writes the scaled values into them
+        test, train = test.astype(np.float64), train.astype(np.float64)
         test, train = scaler.transform(train,test,context['predictors'], context['target'])
         trainX = train[context['predictors']]
         trainY = train[[context['target']]]
@@ -16,10 +241,9 @@ class ModelWorker:
         
         prediction, params = model(trainX, trainY, testX, **context)
         prediction = scaler.inverse(prediction)
-        sharedMemory.close()
-        del context['internalParams']
+        context = {key: value for key, value in context.items() if key != 'internalParams'}
         return  {
-            "date": str(np.datetime_as_string(test.index_col.values[0], unit='D')),
+            "date": str(np.datetime_as_string(test.index.values[0], unit='D')),
             **context,
             "prediction": prediction,
             "value": float(test[context['target']].iloc[0]),
@@ -27,30 +251,135 @@ class ModelWorker:
             "coefs": params,
         }
         
-    @staticmethod
-    def getDataFromSharedMemory(inMemoryData):
-        sharedMemory = shared_memory.SharedMemory(name=inMemoryData['pointer'])
-        sharedArray = np.ndarray(inMemoryData['shape'], dtype=inMemoryData['dtype'], buffer=sharedMemory.buf)
-        data = pd.DataFrame(sharedArray, index=inMemoryData['index_col'], columns=inMemoryData['columns'])
-        return data, sharedMemory
-        
-    
     @staticmethod
     def extractTrainAndTest(
-        data, hour, dayInTestingPeriod, datasetOffset, horizon, trainingWindow
+        data, hour, dayInTestingPeriod, datasetOffset, horizon, trainingWindow, rowIndex=None
     ):
-        filteredData = data[
-            (data["hour"] == hour)
-            & (
-                data["day"]
-                >= datasetOffset - trainingWindow - horizon + dayInTestingPeriod
-            )  # we cannot use future data for training in case of longer horizons (or in case of 9 am cutoff), co we move the trainig period few days back
-            & (data["day"] < datasetOffset + dayInTestingPeriod + 1)
-        ]
+        if rowIndex is not None:
+            filteredData = data.iloc[rowIndex.window(hour, datasetOffset - trainingWindow - horizon + dayInTestingPeriod, datasetOffset + dayInTestingPeriod)]
+        else:
+            filteredData = data[
+                (data["hour"] == hour)
+                & (
+                    data["day"]
+                    >= datasetOffset - trainingWindow - horizon + dayInTestingPeriod
+                )  # we cannot use future data for training in case of longer horizons (or in case of 9 am cutoff), co we move the trainig period few days back
+                & (data["day"] < datasetOffset + dayInTestingPeriod + 1)
+            ]
         train = filteredData.head(
             -1 - horizon
         )  # we cannot use future data for training in case of longer horizons (or in case of 9 am cutoff), co we move the trainig period few days back
         test = filteredData.tail(1)
         
         return test, train
- 
\ No newline at end of file
+ 
+    @staticmethod
+    def batchWorker(data, context, days, model, scaler, rowIndex=None):
+        trainRows, testRows = ModelWorker.extractTrainAndTestBatch(data, context["hour"], days, context["datasetOffset"], context['horizon'], context['trainingWindow'], rowIndex)
+        X = data[context['predictors']].to_numpy(dtype=float)
+        y = data[context['target']].to_numpy(dtype=float)
+        dates = np.datetime_as_string(data.index.values[testRows], unit='D')
+        recordContext = {key: value for key, value in context.items() if key != 'internalParams'}
+
+        results = {}
+        lengths = np.array([len(rows) for rows in trainRows])
+        for length in np.unique(lengths):  # windows only differ in length when there are gaps in the data
+            selected = np.flatnonzero(lengths == length)
+            trainIdx = np.stack([trainRows[i] for i in selected]).reshape(len(selected), length)
+            trainX, trainY, testX = X[trainIdx], y[trainIdx], X[testRows[selected]]
+            if np.isnan(trainX).any() or np.isnan(trainY).any() or np.isnan(testX).any():
+                raise ValueError(f"Input data for hour {context['hour']} and horizon {context['horizon']} contains NaN.")
+
+            trainX, trainY, testX = scaler.transformBatch(trainX, trainY, testX, context['predictors'], context['target'])
+            predictions, params = model(trainX, trainY, testX, **{**context, "days": [days[i] for i in selected]})
+            predictions = scaler.inverseBatch(predictions)
+
+            for i, prediction, x, coefs in zip(selected, predictions, testX, params):
+                results[i] = ModelWorker.record(recordContext, dates[i], days[i], prediction, y[testRows[i]], x, coefs)
+        return [results[i] for i in range(len(days))]
+
+    @staticmethod
+    def directWorker(plane, rowIndex, context, days, model):
+        # test rows of every day at once, straight from the data plane into the columns of the results
+        rows, _, _, tests = ModelWorker.seriesWindows(plane, context["hour"], days, context["datasetOffset"], context['horizon'], context['trainingWindow'], rowIndex)
+        testRows = rows[tests]
+        testX = plane.take(testRows, context["columns"])
+        predictions, params = model(testX, context)
+        columns = {"date": plane.index.values[testRows].astype("datetime64[D]")}
+        for key, value in context.items():
+            if key not in ('internalParams', 'columns'):
+                columns[key] = np.asarray(days) if key == "dayInTestingPeriod" else ColumnarResults.constant(value, len(days))
+        columns.update(
+            prediction=np.asarray(predictions, dtype=np.float64),
+            value=plane.column(plane.positions[context['target']])[testRows].astype(np.float64),
+            testX=testX,
+            coefs=np.asarray(params, dtype=np.float64).reshape(len(days), -1),
+        )
+        return ColumnarResults(columns, len(days))
+
+    @staticmethod
+    def recursiveWorker(data, context, days, model, scaler, rowIndex=None):
+        rows, starts, stops, tests = ModelWorker.seriesWindows(data, context["hour"], days, context["datasetOffset"], context['horizon'], context['trainingWindow'], rowIndex)
+        X = data[context['predictors']].to_numpy(dtype=float)[rows]
+        y = data[context['target']].to_numpy(dtype=float)[rows]
+        if np.isnan(X[starts.min():tests.max() + 1]).any() or np.isnan(y[starts.min():stops.max()]).any():
+            raise ValueError(f"Input data for hour {context['hour']} and horizon {context['horizon']} contains NaN.")
+        dates = np.datetime_as_string(data.index.values[rows[tests]], unit='D')
+        recordContext = {key: value for key, value in context.items() if key != 'internalParams'}
+        refreshEvery = context['internalParams'].get('refreshEvery')
+
+        state = RecursiveLeastSquares(X, y)
+        grams, moments, testX, yCenters, yScales = [], [], [], [], []
+        for i, (start, stop) in enumerate(zip(starts, stops)):
+            if i == 0 or (refreshEvery and i % refreshEvery == 0):
+                state.reset(start, stop)
+            else:
+                state.move(start, stop)
+            center, scale, yCenter, yScale = scaler.fitMoments(*state.moments(), context['predictors'], context['target'])
+            gram, moment = state.normalEquations(center, scale, yCenter, yScale)
+            grams.append(gram)
+            moments.append(moment)
+            testX.append((X[tests[i]] - center) / scale)
+            yCenters.append(yCenter)
+            yScales.append(yScale)
+
+        testX = np.array(testX)
+        predictions, params = model(np.array(grams), np.array(moments), testX, **context)
+        predictions = predictions * np.array(yScales) + np.array(yCenters)
+        return [
+            ModelWorker.record(recordContext, dates[i], days[i], predictions[i], y[tests[i]], testX[i], params[i])
+            for i in range(len(days))
+        ]
+
+    @staticmethod
+    def record(context, date, dayInTestingPeriod, prediction, value, testX, coefs):
+        return {
+            "date": str(date),
+            **context,
+            "dayInTestingPeriod": dayInTestingPeriod,
+            "prediction": float(prediction),
+            "value": float(value),
+            "testX": testX.tolist(),
+            "coefs": coefs.tolist(),
+        }
+
+    @staticmethod
+    def extractTrainAndTestBatch(data, hour, days, datasetOffset, horizon, trainingWindow, rowIndex=None):
+        # the same windows as extractTrainAndTest, for every day of the testing period at once
+        rows, starts, stops, tests = ModelWorker.seriesWindows(data, hour, days, datasetOffset, horizon, trainingWindow, rowIndex)
+        trainRows = [rows[start:stop] for start, stop in zip(starts, stops)]
+        return trainRows, rows[tests]
+
+    @staticmethod
+    def seriesWindows(data, hour, days, datasetOffset, horizon, trainingWindow, rowIndex=None):
+        # rows of the hour series and, per day, the [start, stop) range of its training window and the test position in it
+        if rowIndex is not None:
+            rows, rowDays = rowIndex.series(hour)
+        else:
+            rows = np.flatnonzero(ModelWorker.columnValues(data, "hour") == hour)
+            rowDays = ModelWorker.columnValues(data, "day")[rows]
+        days = np.asarray(days)
+        starts = np.searchsorted(rowDays, datasetOffset - trainingWindow - horizon + days, side="left")
+        ends = np.searchsorted(rowDays, datasetOffset + days, side="right")
+        stops = np.maximum(starts, ends - 1 - horizon)
+        return rows, starts, stops, ends - 1
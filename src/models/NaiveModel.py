@@ -1,15 +1,22 @@
+import numpy as np
 from ..scalers.NoScaler import NoScaler
 from .BaseModel import BaseModel
 
 
 class NaiveModel(BaseModel):
-    def __init__(self, predictors=[], name=None, saveToFile=None):
+    cost = 0.01
+
+    def __init__(self, predictors=[], name=None, saveToFile=None, blockSize=None, cache=False, sink=None, checkpoint=None):
         super().__init__(
-            predictors=predictors if predictors else [lambda context: f"{context['target'].split("_")[0]}_d-{7 - context['horizon']}" if context['horizon'] < 7 else f"{context['target'].split("_")[0]}"],
+            predictors=predictors if predictors else [lambda context: f"{context['target'].split('_')[0]}_d-{7 - context['horizon']}" if context['horizon'] < 7 else f"{context['target'].split('_')[0]}"],
             name=name,
             trainingWindow=7,
             modelParams={},
-            saveToFile=saveToFile
+            saveToFile=saveToFile,
+            blockSize=blockSize,
+            cache=cache,
+            sink=sink,
+            checkpoint=checkpoint,
         )
         self.scaler = NoScaler()
 
@@ -18,3 +25,11 @@ class NaiveModel(BaseModel):
         prediction = testX.values[0][0]
         return prediction, []
 
+    @staticmethod
+    def oneArray(trainX, trainY, testX, context):
+        prediction = testX[0][0]
+        return prediction, []
+
+    @staticmethod
+    def directArray(testX, context):
+        return testX[:, 0], np.empty((len(testX), 0))
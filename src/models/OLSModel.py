@@ -1,11 +1,86 @@
+import numpy as np
 from sklearn import linear_model
 from .BaseModel import BaseModel
+from .LinearSolver import LinearSolver
 
 class OLSModel(BaseModel):
+    def __init__( self,
+        predictors=[],
+        name="Model Name",
+        trainingWindow=28,
+        modelParams={},
+        internalParams={},
+        saveToFile=None,
+        engine="pool",
+        blockSize=None,
+        cache=False,
+        refreshEvery=None, # recursive engine only, recompute the window statistics from scratch every N days
+        recalibrationEvery=1,
+        precision="float64", # "float32" stores the non integer columns of the shared data in single precision
+        sink=None,
+        checkpoint=None, # run directory, completed forecasts are kept there and an interrupted run resumes from them
+    ):
+        if modelParams.get("fit_intercept"):
+            # the normal equations of several training windows are solved without an intercept
+            self.normalArray = None
+        super().__init__(
+            predictors=predictors,
+            name=name,
+            trainingWindow=trainingWindow,
+            modelParams=modelParams,
+            saveToFile=saveToFile,
+            internalParams={**internalParams, 'refreshEvery': refreshEvery},
+            engine=engine,
+            blockSize=blockSize,
+            cache=cache,
+            recalibrationEvery=recalibrationEvery,
+            precision=precision,
+            sink=sink,
+            checkpoint=checkpoint,
+        )
+
     @staticmethod
     def one(trainX, trainY, testX, **context):
         model = linear_model.LinearRegression(**{"fit_intercept": False, **context['modelParams']})
         model.fit(trainX, trainY)
         prediction = model.predict(testX)
         return prediction, model.coef_.tolist()[0]
-      
+
+    @staticmethod
+    def oneArray(trainX, trainY, testX, context):
+        prediction, coefs = OLSModel.batch(trainX[None], trainY[None], testX, **context)
+        return prediction, coefs[0].tolist()
+
+    @staticmethod
+    def fitArray(trainX, trainY, testX, context):
+        params = {"fit_intercept": False, **context['modelParams']}
+        if params.get("positive"):
+            raise ValueError("positive=True is not supported by the array kernels")
+        return LinearSolver.solve(trainX[None], trainY[None], fitIntercept=params["fit_intercept"])
+
+    @staticmethod
+    def predictArray(estimator, testX, context):
+        coefs, intercept = estimator
+        return testX @ coefs[0] + intercept, coefs[0].tolist()
+
+    @staticmethod
+    def batch(trainX, trainY, testX, **context):
+        params = {"fit_intercept": False, **context['modelParams']}
+        if params.get("positive"):
+            raise ValueError("positive=True is not supported by the batched engine")
+        coefs, intercept = LinearSolver.solve(trainX, trainY, fitIntercept=params["fit_intercept"])
+        prediction = np.einsum("bp,bp->b", testX, coefs) + intercept
+        return prediction, coefs
+
+    @staticmethod
+    def normalArray(gram, moment, testX, context):
+        return OLSModel.recursive(gram, moment, testX, **context)
+
+    @staticmethod
+    def recursive(gram, moment, testX, **context):
+        params = {"fit_intercept": False, **context['modelParams']}
+        if params["fit_intercept"] or params.get("positive"):
+            raise ValueError("fit_intercept and positive are not supported by the recursive engine, add a constant predictor instead")
+        coefs = LinearSolver.solveNormal(gram, moment)
+        prediction = np.einsum("bp,bp->b", testX, coefs)
+        return prediction, coefs
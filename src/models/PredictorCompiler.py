@@ -0,0 +1,45 @@
+class PredictorCompiler:
+    # resolves the predictors spec of a model to column names and positions in the shared data,
+    # once per (hour, horizon), or once per day when the spec depends on dayInTestingPeriod
+    def __init__(self, predictors, columns):
+        self.predictors = predictors
+        self.positions = {column: position for position, column in enumerate(columns)}
+        self.dayDependent = not callable(predictors) and any(
+            isinstance(predictor, str) and "{dayInTestingPeriod}" in predictor for predictor in predictors
+        )
+        self.compiled = {}
+
+    def compile(self, context):
+        resolveContext = context if self.dayDependent else {key: value for key, value in context.items() if key != "dayInTestingPeriod"}
+        key = (context["hour"], context["horizon"], resolveContext.get("dayInTestingPeriod"))
+        if key not in self.compiled:
+            try:
+                names = PredictorCompiler.resolve(self.predictors, resolveContext)
+            except KeyError as error:
+                # a callable reading ctx['dayInTestingPeriod'], compile everything per day from now on
+                if self.dayDependent or error.args != ("dayInTestingPeriod",):
+                    raise
+                self.dayDependent = True
+                self.compiled = {}
+                return self.compile(context)
+            missing = [name for name in names if name not in self.positions]
+            if missing:
+                raise KeyError(f"Predictors {missing} are not columns of the data")
+            self.compiled[key] = (names, [self.positions[name] for name in names])
+        return self.compiled[key]
+
+    @staticmethod
+    def resolve(predictors, context):
+        processedColumns = []
+        if callable(predictors):
+            predictors = predictors(context)
+
+        for column in predictors:
+            if callable(column):
+                processedColumns.append(column(context))
+            else:
+                for key in context:
+                    column = column.replace(f"{{{key}}}", str(context[key]))
+                processedColumns.append(column)
+
+        return processedColumns
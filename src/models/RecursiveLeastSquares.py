@@ -0,0 +1,69 @@
+import collections
+import numpy as np
+
+
+class RecursiveLeastSquares:
+    # sufficient statistics of a sliding window over one (hour, horizon) series,
+    # rows are accumulated relative to a shift (window mean at the last refresh) to limit cancellation
+    def __init__(self, X, y):
+        self.X = X
+        self.y = y
+        self.start = self.stop = 0
+        self.reset(0, 0)
+
+    def reset(self, start, stop):
+        X, y = self.X[start:stop], self.y[start:stop]
+        self.shift = X.mean(axis=0) if len(X) else np.zeros(self.X.shape[1])
+        self.yShift = y.mean() if len(y) else 0.0
+        Z, w = X - self.shift, y - self.yShift
+        self.n = len(X)
+        self.sz = Z.sum(axis=0)
+        self.szz = Z.T @ Z
+        self.szw = Z.T @ w
+        self.sw = w.sum()
+        self.sww = w @ w
+        self.counts = [collections.Counter(column) for column in X.T]
+        self.start, self.stop = start, stop
+
+    def move(self, start, stop):
+        # windows only slide forward, so drop rows falling out at the front and add new rows at the back
+        if start >= self.stop:
+            return self.reset(start, stop)
+        for row in range(self.start, start):
+            self.update(row, -1)
+        for row in range(self.stop, stop):
+            self.update(row, 1)
+        self.start, self.stop = start, stop
+
+    def update(self, row, sign):
+        x, y = self.X[row], self.y[row]
+        z, w = x - self.shift, y - self.yShift
+        self.n += sign
+        self.sz += sign * z
+        self.szz += sign * np.outer(z, z)
+        self.szw += sign * z * w
+        self.sw += sign * w
+        self.sww += sign * w * w
+        for counts, value in zip(self.counts, x):
+            counts[value] += sign
+            if not counts[value]:
+                del counts[value]
+
+    def moments(self):
+        mean = self.sz / self.n
+        yMean = self.sw / self.n
+        std = np.sqrt(np.clip(np.diagonal(self.szz) / self.n - mean ** 2, 0, None))
+        yStd = np.sqrt(max(self.sww / self.n - yMean ** 2, 0))
+        unique = np.array([len(counts) for counts in self.counts])
+        return self.shift + mean, std, unique, self.yShift + yMean, yStd
+
+    def normalEquations(self, center, scale, yCenter, yScale):
+        # X'X and X'y of the window after scaling, (X - center) / scale and (y - yCenter) / yScale
+        return RecursiveLeastSquares.scaledEquations(self.n, self.sz, self.szz, self.sw, self.szw, center - self.shift, scale, yCenter - self.yShift, yScale)
+
+    @staticmethod
+    def scaledEquations(n, sz, szz, sw, szw, d, scale, e, yScale):
+        # the same from sums of rows shifted by center - d and yCenter - e
+        gram = szz - np.outer(sz, d) - np.outer(d, sz) + n * np.outer(d, d)
+        moment = szw - e * sz - d * sw + n * d * e
+        return gram / np.outer(scale, scale), moment / (scale * yScale)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import numpy as np
+from .ModelWorker import ModelWorker
+
+
+class ResultCache:
+    # forecasts stored per (date, hour, horizon) under a hash of the model setup, every entry keeps
+    # a fingerprint of the data its window used, so changed data only invalidates the affected forecasts
+    def __init__(self, model, target, data, rowIndex, directory="./results/cache"):
+        self.key = ResultCache.setup(model, target)
+        self.path = os.path.join(directory, f"{self.key}.jsonl")
+        self.data = data
+        self.dates = np.datetime_as_string(data.index.values, unit='D')
+        self.timestamps = data.index.values.astype("datetime64[ns]").view(np.uint64)
+        self.salts = {column: ResultCache.mix(np.uint64(int(ResultCache.digest(column)[:16], 16))) for column in data.columns}
+        self.rowIndex = rowIndex
+        self.recalibrationEvery = model.recalibrationEvery
+        self.rowHashes = {}
+        self.fingerprints = {}
+        self.entries = {}
+        self.hits = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.entries[entry["key"]] = entry
+
+    def lookup(self, context, days):
+        # -> cached records of the days whose data did not change, and the days that still have to be computed
+        hits, missing = {}, []
+        columns = tuple(context["predictors"]) + (context["target"],)
+        for day in days:
+            # a recalibrated forecast also depends on the window of the day it was fitted on
+            fitDay = day - day % self.recalibrationEvery
+            rows = ModelWorker.windowRows(
+                self.data, self.rowIndex, context["hour"],
+                context["datasetOffset"] - context["trainingWindow"] - context["horizon"] + fitDay, context["datasetOffset"] + day,
+            )
+            key = f"{self.dates[rows[-1]]} {context['hour']} {context['horizon']}"
+            fingerprint = ResultCache.digest(self.rowHash(columns)[rows].tobytes())
+            self.fingerprints[(day, context["horizon"], context["hour"])] = (key, fingerprint)
+            entry = self.entries.get(key)
+            if entry is not None and entry["fingerprint"] == fingerprint:
+                hits[day] = {**entry["record"], "dayInTestingPeriod": day, "datasetOffset": context["datasetOffset"]}
+                if "fitDay" in hits[day]:
+                    hits[day]["fitDay"] = fitDay
+            else:
+                missing.append(day)
+        self.hits += len(hits)
+        return hits, missing
+
+    def put(self, record):
+        key, fingerprint = self.fingerprints[(record["dayInTestingPeriod"], record["horizon"], record["hour"])]
+        self.entries[key] = {"key": key, "fingerprint": fingerprint, "record": record}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(f"{self.path}.tmp", "w") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def rowHash(self, columns):
+        # order dependent 64 bit hash of every row restricted to the columns, together with its timestamp
+        if columns not in self.rowHashes:
+            with np.errstate(over="ignore"):
+                rowHash = ResultCache.mix(self.timestamps)
+                for position, column in enumerate(columns):
+                    values = self.data[column].to_numpy(dtype=np.float64).view(np.uint64)
+                    rowHash = ResultCache.mix(rowHash * np.uint64(31 + 2 * position) + ResultCache.mix(values ^ self.salts[column]))
+            self.rowHashes[columns] = rowHash
+        return self.rowHashes[columns]
+
+    @staticmethod
+    def setup(model, target, **extra):
+        # hash of everything of a model that changes its forecasts, besides the data
+        return ResultCache.digest(json.dumps({
+            "model": f"{type(model).__module__}.{type(model).__qualname__}",
+            "trainingWindow": model.trainingWindows or model.trainingWindow,
+            "modelParams": model.modelParams,
+            "internalParams": {key: value for key, value in model.internalParams.items() if key not in model.studyParams},
+            "scaler": type(model.scaler).__name__,
+            "target": target,
+            "recalibrationEvery": model.recalibrationEvery,
+            **extra,
+        }, sort_keys=True, default=ResultCache.describe))
+
+    @staticmethod
+    def mix(x):
+        # splitmix64 finalizer
+        with np.errstate(over="ignore"):
+            x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return x ^ (x >> np.uint64(31))
+
+    @staticmethod
+    def digest(value):
+        if isinstance(value, str):
+            value = value.encode()
+        return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+    @staticmethod
+    def describe(value):
+        # JSON fallback for the model setup: functions by name and bytecode, anything else by repr
+        code = getattr(value, "__code__", None)
+        if code is not None:
+            return f"{value.__module__}.{value.__qualname__}:{ResultCache.digest(code.co_code + repr(code.co_consts).encode())}"
+        return repr(value)
@@ -0,0 +1,26 @@
+import numpy as np
+
+
+class RowIndex:
+    # (days x 24) table of row positions in the preprocessed data, -1 where a (day, hour) row is missing
+    def __init__(self, positions):
+        self.positions = positions
+
+    @staticmethod
+    def build(day, hour):
+        day = np.asarray(day, dtype=np.int64)
+        hour = np.asarray(hour, dtype=np.int64)
+        if np.unique(day * 24 + hour).size != len(day):
+            return None  # repeated hours (e.g. not interpolated DST change), callers fall back to filtering the data
+        positions = np.full((day.max() + 1, 24), -1, dtype=np.int64)
+        positions[day, hour] = np.arange(len(day))
+        return RowIndex(positions)
+
+    def window(self, hour, firstDay, lastDay):
+        rows = self.positions[max(firstDay, 0):lastDay + 1, hour]
+        return rows[rows >= 0]
+
+    def series(self, hour):
+        rows = self.positions[:, hour]
+        days = np.flatnonzero(rows >= 0)
+        return rows[days], days
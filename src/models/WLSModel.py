@@ -1,5 +1,8 @@
+import numpy as np
+import pandas as pd
 from sklearn import linear_model
 from .BaseModel import BaseModel
+from .LinearSolver import LinearSolver
 import matplotlib.pyplot as plt
 
 def basicWeightFunction(context,trainX,testX):
@@ -13,6 +16,13 @@ class WLSModel(BaseModel):
         modelParams={},
         weightFunction=basicWeightFunction,
         saveToFile=None,
+        engine="pool",
+        blockSize=None,
+        cache=False,
+        recalibrationEvery=1,
+        precision="float64",
+        sink=None,
+        checkpoint=None, # run directory, completed forecasts are kept there and an interrupted run resumes from them
     ):
         super().__init__(
             predictors=predictors,
@@ -20,7 +30,14 @@ class WLSModel(BaseModel):
             trainingWindow=trainingWindow,
             modelParams=modelParams,
             saveToFile=saveToFile,
-            internalParams={'weightFunction': weightFunction}
+            internalParams={'weightFunction': weightFunction},
+            engine=engine,
+            blockSize=blockSize,
+            cache=cache,
+            recalibrationEvery=recalibrationEvery,
+            precision=precision,
+            sink=sink,
+            checkpoint=checkpoint,
         )
         
 
@@ -31,4 +48,47 @@ class WLSModel(BaseModel):
         model.fit(trainX, trainY,sample_weight=weights)
         prediction = model.predict(testX)
         return prediction, model.coef_.tolist()[0]
-      
+
+    @staticmethod
+    def oneArray(trainX, trainY, testX, context):
+        prediction, coefs = WLSModel.batch(trainX[None], trainY[None], testX, **{**context, "days": [context['dayInTestingPeriod']]})
+        return prediction, coefs[0].tolist()
+
+    @staticmethod
+    def fitArray(trainX, trainY, testX, context):
+        params = {"fit_intercept": False, **context['modelParams']}
+        if params.get("positive"):
+            raise ValueError("positive=True is not supported by the array kernels")
+        weightFunction = context['internalParams'].get('weightFunction')
+        weights = None
+        if weightFunction is not basicWeightFunction:
+            weights = np.asarray(weightFunction(
+                context, pd.DataFrame(trainX, columns=context['predictors']), pd.DataFrame(testX, columns=context['predictors'])
+            ), dtype=float).ravel()[None]
+        return LinearSolver.solve(trainX[None], trainY[None], weights=weights, fitIntercept=params["fit_intercept"])
+
+    @staticmethod
+    def predictArray(estimator, testX, context):
+        coefs, intercept = estimator
+        return testX @ coefs[0] + intercept, coefs[0].tolist()
+
+    @staticmethod
+    def batch(trainX, trainY, testX, **context):
+        params = {"fit_intercept": False, **context['modelParams']}
+        if params.get("positive"):
+            raise ValueError("positive=True is not supported by the batched engine")
+        weightFunction = context['internalParams'].get('weightFunction')
+        weights = None
+        if weightFunction is not basicWeightFunction:
+            # custom weight functions keep their per window DataFrame interface
+            weights = np.stack([
+                np.asarray(weightFunction(
+                    {**context, "dayInTestingPeriod": day},
+                    pd.DataFrame(windowX, columns=context['predictors']),
+                    pd.DataFrame(windowTestX[None, :], columns=context['predictors']),
+                ), dtype=float).ravel()
+                for day, windowX, windowTestX in zip(context['days'], trainX, testX)
+            ])
+        coefs, intercept = LinearSolver.solve(trainX, trainY, weights=weights, fitIntercept=params["fit_intercept"])
+        prediction = np.einsum("bp,bp->b", testX, coefs) + intercept
+        return prediction, coefs
@@ -0,0 +1,37 @@
+import itertools
+from abc import ABC, abstractmethod
+
+
+class BaseResults(ABC):
+    # lazy handle of the records of a model run, read back chunk by chunk so memory does not grow with the test period
+    def __init__(self, path, chunkSize=10000):
+        self.path = path
+        self.chunkSize = chunkSize
+        self.length = None
+
+    @abstractmethod
+    def chunks(self, size=None):
+        # yields lists of at most size records, in the order they were written
+        pass
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def __len__(self):
+        if self.length is None:
+            self.length = sum(len(chunk) for chunk in self.chunks())
+        return self.length
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        for item in itertools.islice(self, index, None):
+            return item
+        raise IndexError("results index out of range")
+
+    def toList(self):
+        return list(self)
@@ -0,0 +1,21 @@
+from abc import ABC, abstractmethod
+
+
+class BaseSink(ABC):
+    # destination of the forecasts of a model run, records are written as they arrive instead of being kept in memory
+    def __init__(self, path):
+        self.path = path
+
+    @abstractmethod
+    def open(self):
+        # starts a new run, anything written before is discarded
+        pass
+
+    @abstractmethod
+    def write(self, records):
+        pass
+
+    @abstractmethod
+    def close(self):
+        # -> results handle reading the written records back
+        pass
@@ -0,0 +1,200 @@
+import json
+import numbers
+from collections.abc import Sequence
+import numpy as np
+import pandas as pd
+from .BaseResults import BaseResults
+
+
+class ColumnarResults(Sequence):
+    # forecasts of a run stored column by column: typed arrays for date and the numeric fields, (n, predictors)
+    # matrices for testX and coefs when all records have the same number of them, and object arrays for the rest
+    # (predictors, modelParams, MLP params, ...). Indexing and iteration give back the original records
+    missing = object()
+
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @staticmethod
+    def of(data):
+        # ColumnarResults of a list of records, a results handle of a sink or ColumnarResults
+        if isinstance(data, ColumnarResults):
+            return data
+        if isinstance(data, BaseResults):
+            return ColumnarResults.fromChunks(data.chunks())
+        return ColumnarResults.fromRecords(data)
+
+    @staticmethod
+    def parts(data):
+        # ColumnarResults of every chunk of a results handle of a sink, one at a time, or of the whole in memory output,
+        # for the evaluators that aggregate chunk by chunk
+        if isinstance(data, BaseResults):
+            for chunk in data.chunks():
+                if chunk:
+                    yield ColumnarResults.build(chunk)
+            return
+        data = ColumnarResults.of(data)
+        if len(data):
+            yield data
+
+    @staticmethod
+    def fromRecords(records):
+        return ColumnarResults.fromChunks([list(records)])
+
+    @staticmethod
+    def fromChunks(chunks):
+        return ColumnarResults.concat([ColumnarResults.build(chunk) for chunk in chunks if chunk])
+
+    @staticmethod
+    def concat(parts):
+        parts = [part for part in parts if part.length]
+        if not parts:
+            return ColumnarResults({}, 0)
+        if len(parts) == 1:
+            return parts[0]
+        keys = list(dict.fromkeys(key for part in parts for key in part.columns))
+        columns = {}
+        for key in keys:
+            arrays = [part.columns.get(key, ColumnarResults.missingColumn(part.length)) for part in parts]
+            kinds = {(array.dtype.kind, array.ndim, array.shape[1:]) for array in arrays}
+            if len(kinds) == 1 and next(iter(kinds))[0] != "O":
+                columns[key] = np.concatenate(arrays)
+            elif all(array.ndim == 1 and array.dtype.kind in "if" for array in arrays):
+                columns[key] = np.concatenate(arrays).astype(np.float64)
+            else:
+                columns[key] = np.concatenate([ColumnarResults.objects(array) for array in arrays])
+        return ColumnarResults(columns, sum(part.length for part in parts))
+
+    @staticmethod
+    def build(records):
+        keys = list(dict.fromkeys(key for record in records for key in record))
+        return ColumnarResults(
+            {key: ColumnarResults.buildColumn(key, [record.get(key, ColumnarResults.missing) for record in records]) for key in keys},
+            len(records),
+        )
+
+    @staticmethod
+    def buildColumn(key, values):
+        if key == "date" and all(isinstance(value, str) for value in values):
+            dates = np.array(values, dtype="datetime64[D]")
+            if np.datetime_as_string(dates, unit="D").tolist() == values:
+                return dates
+        if all(ColumnarResults.isNumber(value) for value in values):
+            return np.array(values, dtype=np.int64 if all(isinstance(value, numbers.Integral) for value in values) else np.float64)
+        if all(isinstance(value, list) and all(ColumnarResults.isNumber(item) for item in value) for value in values):
+            if len({len(value) for value in values}) == 1:
+                return np.array(values, dtype=np.float64).reshape(len(values), len(values[0]))
+        # repeated values (modelParams, predictors) are kept once
+        shared = {}
+        column = np.empty(len(values), dtype=object)
+        for position, value in enumerate(values):
+            try:
+                column[position] = shared.setdefault(json.dumps(value, sort_keys=True), value)
+            except TypeError:
+                column[position] = value
+        return column
+
+    @staticmethod
+    def constant(value, length):
+        # column of a field every record shares
+        if ColumnarResults.isNumber(value):
+            return np.full(length, value, dtype=np.int64 if isinstance(value, numbers.Integral) else np.float64)
+        column = np.empty(length, dtype=object)
+        column[:] = [value] * length
+        return column
+
+    @staticmethod
+    def isNumber(value):
+        return isinstance(value, numbers.Real) and not isinstance(value, bool)
+
+    @staticmethod
+    def objects(array):
+        if array.dtype.kind == "O":
+            return array
+        column = np.empty(len(array), dtype=object)
+        for position in range(len(array)):
+            column[position] = ColumnarResults.value(array, position)
+        return column
+
+    @staticmethod
+    def missingColumn(length):
+        column = np.empty(length, dtype=object)
+        column[:] = [ColumnarResults.missing] * length
+        return column
+
+    @staticmethod
+    def value(array, position):
+        if array.dtype.kind == "M":
+            return str(np.datetime_as_string(array[position], unit="D"))
+        if array.ndim == 2:
+            return array[position].tolist()
+        if array.dtype.kind == "O":
+            return array[position]
+        return array[position].item()
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ColumnarResults({key: array[index] for key, array in self.columns.items()}, len(range(*index.indices(self.length))))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("results index out of range")
+        record = {}
+        for key, array in self.columns.items():
+            value = ColumnarResults.value(array, index)
+            if value is not ColumnarResults.missing:
+                record[key] = value
+        return record
+
+    def __eq__(self, other):
+        if isinstance(other, (ColumnarResults, list, BaseResults)):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    def take(self, positions):
+        return ColumnarResults({key: array[positions] for key, array in self.columns.items()}, len(positions))
+
+    def column(self, name):
+        return self.columns[name]
+
+    def datetimes(self):
+        # date + hour of every forecast
+        date = self.columns["date"]
+        date = date.astype("datetime64[ns]") if date.dtype.kind == "M" else pd.to_datetime(date).values
+        return date + self.columns["hour"].astype("timedelta64[h]")
+
+    def coefficients(self):
+        # (predictors, rows, (rows, predictors) coefficient matrix) for every group of records with the same
+        # predictors, records without one coefficient per predictor (e.g. MLP params) are left out
+        if not self.length or "predictors" not in self.columns or "coefs" not in self.columns:
+            return
+        predictors, coefs = self.columns["predictors"], self.columns["coefs"]
+        groups = {}
+        for position in range(self.length):
+            names = predictors[position]
+            if not names or names is ColumnarResults.missing:
+                continue
+            names = tuple(names) if isinstance(names, list) else (names,)
+            groups.setdefault(names, []).append(position)
+        for names, rows in groups.items():
+            rows = np.array(rows)
+            if coefs.ndim == 2:
+                if coefs.shape[1] == len(names):
+                    yield list(names), rows, coefs[rows]
+                continue
+            valid, matrix = [], []
+            for position in rows:
+                values = coefs[position]
+                if not isinstance(values, list) or len(values) == 0:
+                    continue
+                if isinstance(values[0], list):
+                    values = values[0]
+                if len(values) == len(names):
+                    valid.append(position)
+                    matrix.append(values)
+            if valid:
+                yield list(names), np.array(valid), np.array(matrix, dtype=np.float64)
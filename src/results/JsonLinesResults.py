@@ -0,0 +1,16 @@
+import json
+from .BaseResults import BaseResults
+
+
+class JsonLinesResults(BaseResults):
+    def chunks(self, size=None):
+        size = size or self.chunkSize
+        chunk = []
+        with open(self.path, "r") as f:
+            for line in f:
+                chunk.append(json.loads(line))
+                if len(chunk) == size:
+                    yield chunk
+                    chunk = []
+        if chunk:
+            yield chunk
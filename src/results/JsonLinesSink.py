@@ -0,0 +1,31 @@
+import json
+import os
+from .BaseSink import BaseSink
+from .JsonLinesResults import JsonLinesResults
+
+
+class JsonLinesSink(BaseSink):
+    # one JSON record per line
+    def __init__(self, path, chunkSize=10000):
+        super().__init__(path)
+        self.chunkSize = chunkSize
+        self.file = None
+        self.length = 0
+
+    def open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.file = open(self.path, "w")
+        self.length = 0
+
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record) + "\n")
+            self.length += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        results = JsonLinesResults(self.path, self.chunkSize)
+        results.length = self.length
+        return results
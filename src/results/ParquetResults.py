@@ -0,0 +1,29 @@
+import json
+import os
+from .BaseResults import BaseResults
+
+
+class ParquetResults(BaseResults):
+    # column with the fields of a record outside the columns of the file and the ones it lacks, as JSON
+    other = "_other"
+
+    def chunks(self, size=None):
+        if not os.path.exists(self.path):
+            return
+        import pyarrow.parquet as pq
+
+        file = pq.ParquetFile(self.path)
+        nested = set(json.loads(file.schema_arrow.metadata[b"nested"]))
+        for batch in file.iter_batches(batch_size=size or self.chunkSize):
+            records = batch.to_pylist()
+            for record in records:
+                rest = record.pop(ParquetResults.other, None)
+                if rest is not None:
+                    rest = json.loads(rest)
+                    for key in rest["missing"]:
+                        del record[key]
+                    record.update(rest["extra"])
+                for key in nested:
+                    if key in record:
+                        record[key] = json.loads(record[key])
+            yield records
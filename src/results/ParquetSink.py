@@ -0,0 +1,81 @@
+import json
+import os
+from .BaseSink import BaseSink
+from .ParquetResults import ParquetResults
+
+
+class ParquetSink(BaseSink):
+    # columnar Parquet file written in row groups of rowGroupSize records, needs pyarrow. Scalar fields become typed
+    # columns, lists and dicts (testX, coefs, predictors, modelParams) are stored as JSON text
+    def __init__(self, path, rowGroupSize=10000):
+        super().__init__(path)
+        self.rowGroupSize = rowGroupSize
+        self.writer = None
+        self.buffer = []
+        self.length = 0
+        self.nested = set()
+
+    def open(self):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as error:
+            raise ImportError("ParquetSink needs pyarrow, install it with `pip install pyarrow` or use JsonLinesSink") from error
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.writer = None
+        self.buffer = []
+        self.length = 0
+        self.nested = set()
+
+    def write(self, records):
+        self.buffer.extend(records)
+        while len(self.buffer) >= self.rowGroupSize:
+            self.flush(self.buffer[:self.rowGroupSize])
+            self.buffer = self.buffer[self.rowGroupSize:]
+
+    def flush(self, records):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            keys = list(dict.fromkeys(key for record in records for key in record))
+            self.nested = {key for key in keys if any(isinstance(record.get(key), (list, tuple, dict)) for record in records)}
+        else:
+            keys = [name for name in self.writer.schema.names if name != ParquetResults.other]
+        columns = {
+            key: [
+                (json.dumps(record[key]) if key in self.nested else record[key]) if key in record else None
+                for record in records
+            ]
+            for key in keys
+        }
+        # the columns are fixed by the first row group, the fields of a record outside them and the ones it lacks
+        # are kept as JSON in the other column, so every record is read back as it was written
+        columns[ParquetResults.other] = pa.array([ParquetSink.rest(record, keys) for record in records], type=pa.string())
+        table = pa.table(columns) if self.writer is None else pa.table(columns, schema=self.writer.schema)
+        if self.writer is None:
+            metadata = {b"nested": json.dumps(sorted(self.nested)).encode()}
+            table = table.replace_schema_metadata(metadata)
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table)
+        self.length += len(records)
+
+    @staticmethod
+    def rest(record, keys):
+        extra = {key: value for key, value in record.items() if key not in keys}
+        missing = [key for key in keys if key not in record]
+        if not extra and not missing:
+            return None
+        return json.dumps({"extra": extra, "missing": missing})
+
+    def close(self):
+        if self.buffer:
+            self.flush(self.buffer)
+            self.buffer = []
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        results = ParquetResults(self.path, self.rowGroupSize)
+        results.length = self.length
+        return results
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class NoScaler:
     def __init__(self):
         pass
@@ -6,4 +9,22 @@ class NoScaler:
         return test, train
 
     def inverse(self, prediction):
-        return prediction
\ No newline at end of file
+        return prediction
+
+    def transformBatch(self, trainX, trainY, testX, predictors, target):
+        return trainX, trainY, testX
+
+    def fitBatch(self, trainX, trainY, predictors, target):
+        return trainX, trainY
+
+    def applyBatch(self, testX):
+        return testX
+
+    def fitMoments(self, mean, std, unique, yMean, yStd, predictors, target):
+        return np.zeros_like(mean), np.ones_like(mean), np.zeros_like(yMean), np.ones_like(yMean)
+
+    def fitSeries(self, X, y, starts, stops, unique, predictors, target):
+        return np.zeros((len(starts), X.shape[1])), np.ones((len(starts), X.shape[1])), np.zeros(len(starts)), np.ones(len(starts))
+
+    def inverseBatch(self, predictions):
+        return predictions
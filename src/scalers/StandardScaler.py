@@ -1,3 +1,4 @@
+import numpy as np
 from sklearn.preprocessing import StandardScaler as StandardScalerSklearn
 class StandardScaler:
     def __init__(self):
@@ -15,4 +16,80 @@ class StandardScaler:
         return test, train
 
     def inverse(self, prediction):
-        return self.scaler.inverse_transform(prediction.reshape(-1, 1)).item()
\ No newline at end of file
+        return self.scaler.inverse_transform(prediction.reshape(-1, 1)).item()
+
+    def transformBatch(self, trainX, trainY, testX, predictors, target):
+        # same scaling as transform, for a stack of windows: trainX (windows, rows, predictors), testX (windows, predictors)
+        trainX, trainY = self.fitBatch(trainX, trainY, predictors, target)
+        return trainX, trainY, self.applyBatch(testX)
+
+    def fitBatch(self, trainX, trainY, predictors, target):
+        # fits the scaling on the windows and returns them scaled, applyBatch and inverseBatch reuse it afterwards
+        ordered = np.sort(trainX, axis=1)
+        unique = 1 + (np.diff(ordered, axis=1) != 0).sum(axis=1)
+        center, scale, yCenter, yScale = self.fitMoments(
+            trainX.mean(axis=1), trainX.std(axis=1), unique, trainY.mean(axis=1), trainY.std(axis=1), predictors, target
+        )
+        trainX = (trainX - center[:, None, :]) / scale[:, None, :]
+        trainY = (trainY - yCenter[:, None]) / yScale[:, None]
+        return trainX, trainY
+
+    def fitSeries(self, X, y, starts, stops, unique, predictors, target):
+        # scaling of every [start, stop) window of the rows of a series X (rows, predictors), y (rows,), from cumulative
+        # sums instead of one pass per window. unique: distinct values of every column in the whole data, columns with
+        # at most 2 are dummies in every window, the others are dummies in the windows where they take at most 2 values
+        mean, std = StandardScaler.windowMoments(X, starts, stops)
+        yMean, yStd = StandardScaler.windowMoments(y, starts, stops)
+        windowUnique = np.broadcast_to(unique, mean.shape).copy()
+        for column in np.flatnonzero(np.asarray(unique) > 2):
+            windowUnique[:, column] = np.where(StandardScaler.twoValued(X[:, column], starts, stops), 2, 3)
+        return self.fitMoments(mean, std, windowUnique, yMean, yStd, predictors, target)
+
+    @staticmethod
+    def twoValued(values, starts, stops):
+        # whether each [start, stop) window of values holds at most 2 distinct values, without sorting the windows. In
+        # the runs of equal values a window stays 2 valued as long as every run equals the one two runs before it
+        # (after its first two runs), so it is enough to count the runs breaking that over the runs of the window
+        change = values[1:] != values[:-1]
+        run = np.concatenate([[0], np.cumsum(change)])
+        runValues = values[np.concatenate([[0], np.flatnonzero(change) + 1])]
+        breaks = np.concatenate([[0, 0], runValues[2:] != runValues[:-2]]) if len(runValues) > 2 else np.zeros(len(runValues))
+        counts = np.concatenate([[0], np.cumsum(breaks)])
+        first = run[np.minimum(starts, len(values) - 1)]
+        last = run[np.clip(stops - 1, np.minimum(starts, len(values) - 1), len(values) - 1)]
+        return counts[last + 1] - counts[np.minimum(first + 2, last + 1)] == 0
+
+    @staticmethod
+    def windowMoments(values, starts, stops):
+        # mean and standard deviation of the rows [start, stop) of values for every window. The values are shifted by
+        # their mean first, which keeps the sums of squares accurate for series far from zero. Only the training rows
+        # are read, the targets of the last test rows are not known yet (NaN)
+        values = values[:stops.max()]
+        shift = values.mean(axis=0)
+        shifted = values - shift
+        zeros = np.zeros((1,) + values.shape[1:])
+        sums = np.concatenate([zeros, np.cumsum(shifted, axis=0)])
+        squares = np.concatenate([zeros, np.cumsum(shifted ** 2, axis=0)])
+        counts = (stops - starts).reshape((-1,) + (1,) * (values.ndim - 1))
+        mean = (sums[stops] - sums[starts]) / counts
+        meanSquare = (squares[stops] - squares[starts]) / counts
+        variance = meanSquare - mean ** 2
+        # cancellation leaves a tiny variance in constant windows, which must not become their scale
+        variance[variance <= 1e-12 * meanSquare] = 0
+        return mean + shift, np.sqrt(variance)
+
+    def applyBatch(self, testX):
+        return (testX - self.center) / self.spread
+
+    def fitMoments(self, mean, std, unique, yMean, yStd, predictors, target):
+        # window statistics -> (center, scale) of predictors and target, dummies (at most 2 distinct values) are left as they are
+        numeric = (unique > 2) & (np.asarray(predictors) != target)
+        center = np.where(numeric, mean, 0)
+        scale = np.where(numeric & (std > 0), std, 1)
+        self.center, self.spread = center, scale
+        self.mean = np.asarray(yMean)
+        self.scale = np.where(np.asarray(yStd) > 0, yStd, 1)
+        return center, scale, self.mean, self.scale
+
+    def inverseBatch(self, predictions):
+        return predictions * self.scale + self.mean
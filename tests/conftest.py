@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="session")
+def model_data():
+    rng = np.random.default_rng(0)
+    index = pd.date_range("2024-01-01", periods=24 * 120, freq="h", name="datetime")
+    hours = index.hour.to_numpy()
+    days = np.arange(len(index)) // 24
+    load = 1000 + 200 * np.sin(2 * np.pi * hours / 24) + 50 * np.sin(2 * np.pi * days / 7) + rng.normal(0, 20, len(index))
+    data = pd.DataFrame({"load": load}, index=index)
+    data["load_d-1"] = data["load"].shift(24)
+    data["load_d-7"] = data["load"].shift(24 * 7)
+    data["is_weekend"] = (index.dayofweek >= 5).astype(float)
+    data["is_holiday"] = (rng.random(len(index) // 24) < 0.1).repeat(24).astype(float)
+    data["temperature"] = 10 + 5 * np.sin(2 * np.pi * days / 60) + rng.normal(0, 1, len(index))
+    return data.bfill()
+
+
+@pytest.fixture(autouse=True)
+def max_threads(monkeypatch):
+    monkeypatch.setenv("MAX_THREADS", "2")
@@ -0,0 +1,41 @@
+import pytest
+import multiprocessing as mp
+from src.models.LassoModel import LassoModel
+from src.models.NaiveModel import NaiveModel
+from src.models.OLSModel import OLSModel
+from src.models.WLSModel import WLSModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "is_holiday", "temperature"]
+
+
+def frameOnly(model_class):
+    return type(f"{model_class.__name__}Frame", (model_class,), {"oneArray": None})
+
+
+@pytest.mark.parametrize("model_class,kwargs", [
+    (OLSModel, {"predictors": predictors, "trainingWindow": 28}),
+    (WLSModel, {"predictors": predictors, "trainingWindow": 28}),
+    (LassoModel, {"predictors": predictors, "trainingWindow": 28, "modelParams": {"cv": 3}}),
+    (NaiveModel, {"predictors": ["load_d-7"]}),
+])
+def test_array_kernel_matches_dataframe_kernel(model_data, model_class, kwargs):
+    args = (1, model_data, "2024-04-01", "2024-04-01", "load")
+    expected = frameOnly(model_class)(**kwargs).run(*args)
+    actual = model_class(**kwargs).run(*args)
+    assert len(expected) == len(actual) == 24
+    for e, a in zip(expected, actual):
+        assert e.keys() == a.keys()
+        assert {k: v for k, v in e.items() if k not in ("prediction", "testX", "coefs")} == \
+               {k: v for k, v in a.items() if k not in ("prediction", "testX", "coefs")}
+        assert e["prediction"] == pytest.approx(a["prediction"], rel=1e-6)
+        assert e["testX"] == pytest.approx(a["testX"])
+        assert e["coefs"] == pytest.approx(a["coefs"], abs=1e-6)
+
+
+def test_naive_model_runs_without_the_pool(model_data, monkeypatch):
+    args = (2, model_data, "2024-04-01", "2024-04-03", "load")
+    expected = type("NaivePool", (NaiveModel,), {"directArray": None})(["load_d-7"]).run(*args)
+    monkeypatch.setattr(mp, "Pool", None)
+    actual = NaiveModel(["load_d-7"]).run(*args)
+    assert len(actual) == 3 * 2 * 24
+    assert actual == expected
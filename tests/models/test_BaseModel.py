@@ -0,0 +1,57 @@
+import pytest
+from src.models.BaseModel import BaseModel
+from src.models.OLSModel import OLSModel
+from src.models.PredictorCompiler import PredictorCompiler
+
+predictors = ["load", "load_d-1", "is_weekend", lambda ctx: "temperature" if ctx["dayInTestingPeriod"] < 1 else "load_d-7"]
+
+
+def test_blocks_split_on_predictor_change():
+    model = OLSModel(predictors)
+    compiler = PredictorCompiler(predictors, ["load", "load_d-1", "load_d-7", "is_weekend", "temperature"])
+    blocks = list(model.blocks(compiler, [0, 1, 2], 5, 1, 100, "load"))
+    assert [days for _, days in blocks] == [[0], [1, 2]]
+    assert blocks[0][0]["predictors"][-1] == "temperature"
+    assert blocks[1][0]["predictors"][-1] == "load_d-7"
+    assert blocks[1][0]["columns"] == [0, 1, 3, 2]
+
+
+@pytest.mark.parametrize("blockSize", [1, 2])
+def test_block_size_does_not_change_results(model_data, blockSize):
+    args = (2, model_data, "2024-04-01", "2024-04-03", "load")
+    default = OLSModel(predictors, trainingWindow=14).run(*args)
+    blocked = OLSModel(predictors, trainingWindow=14, blockSize=blockSize).run(*args)
+    assert [(r["dayInTestingPeriod"], r["horizon"], r["hour"]) for r in blocked] == [
+        (day, horizon, hour) for day in range(3) for horizon in (1, 2) for hour in range(24)
+    ]
+    # the window sums of a block start at its first day, so the scaling can differ in the last bits
+    for d, b in zip(default, blocked):
+        assert {k: v for k, v in d.items() if k not in ("prediction", "testX", "coefs")} == \
+               {k: v for k, v in b.items() if k not in ("prediction", "testX", "coefs")}
+        assert d["prediction"] == pytest.approx(b["prediction"], rel=1e-12)
+        assert d["testX"] == pytest.approx(b["testX"], rel=1e-9, abs=1e-12)
+        assert d["coefs"] == pytest.approx(b["coefs"], rel=1e-9, abs=1e-12)
+
+
+def test_tasks_are_fed_with_bounded_in_flight_work():
+    class Pool:
+        def apply_async(self, function, args):
+            inFlight.append(args[0])
+            return self
+
+        def get(self):
+            inFlight.pop(0)
+            return []
+
+    def tasks():
+        for task in range(100):
+            produced.append(task)
+            assert len(inFlight) < limit
+            yield None, task
+
+    produced, inFlight = [], []
+    limit = BaseModel.processes() * BaseModel.tasksInFlight
+    feed = BaseModel.feed(Pool(), tasks())
+    next(feed)
+    assert len(produced) == limit
+    assert len(list(feed)) == 99
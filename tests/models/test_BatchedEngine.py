@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from src.models.LassoModel import LassoModel
+from src.models.OLSModel import OLSModel
+from src.models.WLSModel import WLSModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "is_holiday", "temperature"]
+
+
+def linearWeights(context, trainX, testX):
+    return np.linspace(0.5, 1, len(trainX))
+
+
+def assert_same_results(expected, actual):
+    assert len(expected) == len(actual)
+    for e, a in zip(expected, actual):
+        assert (e["date"], e["hour"], e["horizon"], e["dayInTestingPeriod"]) == (a["date"], a["hour"], a["horizon"], a["dayInTestingPeriod"])
+        assert e["predictors"] == a["predictors"]
+        assert e["value"] == pytest.approx(a["value"])
+        assert e["prediction"] == pytest.approx(a["prediction"], rel=1e-6)
+        assert np.allclose(e["testX"], a["testX"])
+        assert np.allclose(e["coefs"], a["coefs"], atol=1e-6)
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        OLSModel(predictors, engine="gpu")
+
+
+def test_engine_not_supported_by_model():
+    with pytest.raises(ValueError):
+        LassoModel(predictors, engine="batched")
+
+
+@pytest.mark.parametrize("model_class,extra", [
+    (OLSModel, {}),
+    (WLSModel, {}),
+    (WLSModel, {"weightFunction": linearWeights}),
+])
+def test_batched_engine_matches_pool_engine(model_data, model_class, extra):
+    pool = model_class(predictors, trainingWindow=28, **extra).run(2, model_data, "2024-04-01", "2024-04-04", "load")
+    batched = model_class(predictors, trainingWindow=28, engine="batched", **extra).run(2, model_data, "2024-04-01", "2024-04-04", "load")
+    assert_same_results(pool, batched)
+
+
+@pytest.mark.parametrize("refreshEvery", [None, 2])
+def test_recursive_engine_matches_batched_engine(model_data, refreshEvery):
+    batched = OLSModel(predictors, trainingWindow=28, engine="batched").run(2, model_data, "2024-03-01", "2024-04-15", "load")
+    recursive = OLSModel(predictors, trainingWindow=28, engine="recursive", refreshEvery=refreshEvery).run(2, model_data, "2024-03-01", "2024-04-15", "load")
+    assert_same_results(batched, recursive)
+
+
+def test_window_constant_column_matches_batched_engine(model_data):
+    # month is constant in most windows and takes 2 values around a month change, it is only scaled in none of them
+    data = model_data.assign(month=model_data.index.month)
+    args = (1, data, "2024-03-20", "2024-04-20", "load")
+    columns = ["load_d-1", "load_d-7", "month", "is_weekend"]
+    pool = OLSModel(columns, trainingWindow=14).run(*args)
+    assert_same_results(OLSModel(columns, trainingWindow=14, engine="batched").run(*args), pool)
+
+
+def test_pool_engine_forecasts_the_last_days_of_the_data(model_data):
+    # the targets of the last horizon days are not known yet
+    args = (2, model_data, "2024-04-25", "2024-04-29", "load")
+    pool = OLSModel(predictors, trainingWindow=14).run(*args)
+    batched = OLSModel(predictors, trainingWindow=14, engine="batched").run(*args)
+    assert np.isfinite(pool.column("prediction")).all()
+    assert pool.column("prediction") == pytest.approx(batched.column("prediction"), rel=1e-9)
+    assert np.isnan(pool.column("value")).any()
+
+
+def test_internal_params_are_kept():
+    model = OLSModel(predictors, "OLS", 28, {}, {"note": 1}, engine="recursive", refreshEvery=2)
+    assert model.internalParams == {"note": 1, "refreshEvery": 2}
+
+
+def test_recursive_engine_not_supported_by_wls():
+    with pytest.raises(ValueError):
+        WLSModel(predictors, engine="recursive")
@@ -0,0 +1,81 @@
+import os
+import pytest
+from src.models.ModelWorker import ModelWorker
+from src.models.OLSModel import OLSModel
+
+predictors = ["load", "load_d-1", "is_weekend", "temperature"]
+
+
+@pytest.fixture
+def computed_days(monkeypatch):
+    computed = []
+    batchWorker = ModelWorker.batchWorker
+
+    def countingWorker(data, context, days, *args):
+        computed.extend((day, context["horizon"], context["hour"]) for day in days)
+        return batchWorker(data, context, days, *args)
+
+    monkeypatch.setattr(ModelWorker, "batchWorker", countingWorker)
+    return computed
+
+
+def run(data, directory, **kwargs):
+    return OLSModel(predictors, trainingWindow=14, engine="batched", checkpoint=str(directory), **kwargs).run(1, data, "2024-04-01", "2024-04-03", "load")
+
+
+def interrupt_after(monkeypatch, series):
+    batchWorker = ModelWorker.batchWorker
+    calls = []
+
+    def failingWorker(*args):
+        if len(calls) == series:
+            raise KeyboardInterrupt
+        calls.append(1)
+        return batchWorker(*args)
+
+    monkeypatch.setattr(ModelWorker, "batchWorker", failingWorker)
+
+
+def test_checkpoint_resumes_interrupted_run(model_data, computed_days, tmp_path, monkeypatch):
+    expected = OLSModel(predictors, trainingWindow=14, engine="batched").run(1, model_data, "2024-04-01", "2024-04-03", "load")
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 10)
+        with pytest.raises(KeyboardInterrupt):
+            run(model_data, tmp_path)
+    assert os.path.exists(tmp_path / "forecasts.jsonl")
+    computed_days.clear()
+    assert run(model_data, tmp_path) == expected
+    assert len(computed_days) == 72 - 10 * 3
+    assert not os.path.exists(tmp_path / "forecasts.jsonl")
+
+
+def test_checkpoint_of_other_setup_is_discarded(model_data, computed_days, tmp_path, monkeypatch):
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 10)
+        with pytest.raises(KeyboardInterrupt):
+            run(model_data, tmp_path)
+    computed_days.clear()
+    run(model_data, tmp_path, modelParams={"fit_intercept": True})
+    assert len(computed_days) == 72
+
+
+def test_checkpoint_with_pool_engine(model_data, tmp_path):
+    expected = OLSModel(predictors, trainingWindow=14).run(1, model_data, "2024-04-01", "2024-04-03", "load")
+    results = OLSModel(predictors, trainingWindow=14, checkpoint=str(tmp_path)).run(1, model_data, "2024-04-01", "2024-04-03", "load")
+    assert results == expected
+    assert not os.path.exists(tmp_path / "forecasts.jsonl")
+
+
+def test_checkpoint_survives_two_interruptions(model_data, computed_days, tmp_path, monkeypatch):
+    expected = OLSModel(predictors, trainingWindow=14, engine="batched").run(1, model_data, "2024-04-01", "2024-04-03", "load")
+    for series in (10, 5):
+        with monkeypatch.context() as patch:
+            interrupt_after(patch, series)
+            with pytest.raises(KeyboardInterrupt):
+                run(model_data, tmp_path)
+        # the interruption cuts the last line in half
+        with open(tmp_path / "forecasts.jsonl", "a") as f:
+            f.write('{"dayInTestingPeriod": 1, "hor')
+    computed_days.clear()
+    assert run(model_data, tmp_path) == expected
+    assert len(computed_days) == 72 - 15 * 3
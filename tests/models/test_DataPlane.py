@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pytest
+from src.evaluators.EvaluatorPipeline import EvaluatorPipeline
+from src.evaluators.MaeEvaluator import MaeEvaluator
+from src.models.BaseModel import BaseModel
+from src.models.DataPlane import DataPlane
+from src.models.ModelWorker import ModelWorker
+from src.models.OLSModel import OLSModel
+
+
+@pytest.fixture
+def plane_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(DataPlane, "directory", str(tmp_path / "planes"))
+    return tmp_path / "planes"
+
+
+def test_plane_is_shared_and_reference_counted(model_data, plane_directory):
+    model = OLSModel()
+    plane = DataPlane.acquire(model_data, 2, "load", model.preprocess)
+    assert DataPlane.acquire(model_data, 2, "load", OLSModel().preprocess) is plane
+    assert DataPlane.acquire(model_data, 1, "load", model.preprocess) is not plane
+    expected = model.preprocess(model_data, 2, "load")
+    assert plane.frame.index.equals(expected.index)
+    assert np.array_equal(plane.frame.to_numpy(), expected.to_numpy(dtype=float), equal_nan=True)
+    assert os.path.isdir(plane.path)
+    plane.release()
+    assert os.path.isdir(plane.path)
+    plane.release()
+    assert not os.path.exists(plane.path)
+    DataPlane.releaseAll()
+    assert os.listdir(plane_directory) == []
+
+
+def test_plane_keeps_timezone(model_data, plane_directory):
+    data = model_data.tz_localize("Europe/Warsaw", ambiguous="NaT", nonexistent="shift_forward")
+    data = data[data.index.notna()]
+    plane = DataPlane.acquire(data, 1, "load", BaseModel.preprocess.__get__(OLSModel()))
+    assert plane.frame.index.equals(data.index)
+    assert DataPlane.open(plane.path).frame.index.equals(data.index)
+    DataPlane.opened.clear()
+    plane.release()
+
+
+def test_sweep_removes_planes_of_dead_processes(model_data, plane_directory):
+    (plane_directory / "999999999-stale").mkdir(parents=True)
+    plane = DataPlane.acquire(model_data, 1, "load", OLSModel().preprocess)
+    assert sorted(os.listdir(plane_directory)) == [os.path.basename(plane.path)]
+    plane.release()
+
+
+def test_runs_leave_no_planes(model_data, plane_directory):
+    OLSModel(["load", "load_d-1"]).run(1, model_data, "2024-04-01", "2024-04-01", "load")
+    assert os.listdir(plane_directory) == []
+
+
+def test_compact_storage(model_data, plane_directory):
+    plane = DataPlane.acquire(model_data, 1, "load", OLSModel().preprocess, "float32")
+    dtypes = dict(zip(plane.columns, plane.dtypes))
+    assert dtypes["is_weekend"] == dtypes["hour"] == dtypes["ones"] == np.int8
+    assert dtypes["numeric_index"] == np.int16
+    assert dtypes["load_d-1"] == dtypes["temperature"] == np.float32
+    # the target and its shifted copies are not rounded
+    assert dtypes["load"] == dtypes["load_d+1"] == np.float64
+    assert np.array_equal(plane.frame["load"].to_numpy(), model_data["load"].to_numpy())
+    assert np.array_equal(plane.frame["is_weekend"].to_numpy(), model_data["is_weekend"].to_numpy())
+    plane.release()
+
+
+def test_float32_precision(model_data, plane_directory):
+    predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "temperature"]
+    expected = OLSModel(predictors).run(1, model_data, "2024-04-01", "2024-04-02", "load")
+    actual = OLSModel(predictors, precision="float32").run(1, model_data, "2024-04-01", "2024-04-02", "load")
+    for e, a in zip(expected, actual):
+        assert a["prediction"] == pytest.approx(e["prediction"], rel=1e-4)
+
+
+def test_pipeline_shares_the_plane_of_its_precision(model_data, plane_directory, tmp_path, monkeypatch):
+    built = []
+    build = DataPlane.build
+    monkeypatch.setattr(DataPlane, "build", lambda frame, precision, *args: built.append(precision) or build(frame, precision, *args))
+    pipeline = EvaluatorPipeline(model_data, "2024-04-01", "2024-04-01")
+    for name in ("first", "second"):
+        pipeline.add_model(OLSModel(["load_d-1", "temperature"], name=name, precision="float32"))
+    pipeline.add_evaluator(MaeEvaluator(type="all"))
+    pipeline.execute(tmp_path / "results.xlsx")
+    assert built == ["float32"]
+
+
+def test_workers_map_only_read_columns(model_data, plane_directory):
+    model = OLSModel(["load_d-1", lambda ctx: "is_weekend"])
+    job = model.prepare(2, model_data, "2024-04-01", "2024-04-01", "load")
+    try:
+        ModelWorker.attach(job["key"], job["run"])
+        for task in job["tasks"]:
+            ModelWorker.blockWorker(task)
+        plane = ModelWorker.runs[job["key"]]["plane"]
+        columns = [plane.columns[position] for position in plane.mapped]
+        assert sorted(columns) == sorted(["load_d-1", "is_weekend", "load_d+1", "load_d+2"])
+    finally:
+        del ModelWorker.runs[job["key"]]
+        del DataPlane.opened[job["plane"].path]
+        model.release(job)
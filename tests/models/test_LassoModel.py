@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from src.models.LassoModel import LassoModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "temperature"]
+args = (1, "2024-04-01", "2024-04-03", "load")
+
+
+def run(model, data):
+    horizon, start, end, target = args
+    return model.run(horizon, data, start, end, target)
+
+
+def context(day, **internalParams):
+    return {
+        "dayInTestingPeriod": day,
+        "modelParams": {"cv": 3},
+        "internalParams": {"warmStart": True, "reselectEvery": 1, "alphaWindow": None, "criterion": None, **internalParams},
+    }
+
+
+def windows(days):
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(60 + days, 6))
+    y = X @ np.array([1.0, -2.0, 0.0, 0.0, 0.5, 0.0]) + rng.normal(0, 0.5, len(X))
+    return [(X[day:day + 60], y[day:day + 60], X[day + 60:day + 61]) for day in range(days)]
+
+
+def test_warm_start_selecting_daily_matches_lasso_cv(model_data):
+    expected = run(LassoModel(predictors, trainingWindow=28, modelParams={"cv": 3}), model_data)
+    warm = run(LassoModel(predictors, trainingWindow=28, modelParams={"cv": 3}, warmStart=True), model_data)
+    assert warm.column("prediction") == pytest.approx(expected.column("prediction"))
+
+
+def test_alpha_is_reselected_every_n_days(monkeypatch):
+    selected = []
+    select = LassoModel.select
+
+    def countingSelect(trainX, trainY, context, previousAlpha=None):
+        selected.append(context["dayInTestingPeriod"])
+        return select(trainX, trainY, context, previousAlpha)
+
+    monkeypatch.setattr(LassoModel, "select", countingSelect)
+    state = {}
+    for day, (trainX, trainY, testX) in enumerate(windows(8)):
+        prediction, coefs = LassoModel.warmArray(trainX, trainY, testX, context(day, reselectEvery=3), state)
+        assert np.isfinite(prediction).all() and len(coefs) == 6
+    assert selected == [0, 3, 6]
+
+
+def test_alpha_window_narrows_the_grid():
+    trainX, trainY, _ = windows(1)[0]
+    model = LassoModel.select(trainX, trainY, context(1, alphaWindow=2), previousAlpha=0.1)
+    assert len(model.alphas_) == 5
+    assert model.alphas_[2] == pytest.approx(0.1)
+    assert model.alphas_[0] > model.alphas_[1] > model.alphas_[2]
+
+
+def test_information_criterion(model_data):
+    results = run(LassoModel(predictors, trainingWindow=28, criterion="bic", warmStart=True, reselectEvery=7), model_data)
+    assert len(results) == 3 * 24
+    assert np.isfinite(results.column("prediction")).all()
+
+
+def test_warm_start_blocks_start_on_reselection_days(model_data):
+    model = LassoModel(predictors, trainingWindow=28, modelParams={"cv": 3}, warmStart=True, reselectEvery=2, blockSize=1)
+    assert model.blockPeriod(7) == 2
+    assert LassoModel(predictors, warmStart=True, alphaWindow=3).blockPeriod(7) == 7
+    assert run(model, model_data).column("prediction") == pytest.approx(
+        run(LassoModel(predictors, trainingWindow=28, modelParams={"cv": 3}, warmStart=True, reselectEvery=2), model_data).column("prediction"), rel=1e-6
+    )
+
+
+def test_warm_start_without_recalibration():
+    with pytest.raises(ValueError):
+        LassoModel(predictors, warmStart=True, recalibrationEvery=7)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from sklearn.linear_model import LinearRegression
+from src.models.LinearSolver import LinearSolver
+
+
+@pytest.mark.parametrize("fit_intercept", [False, True])
+def test_solve_matches_sklearn(fit_intercept):
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(4, 30, 3))
+    y = rng.normal(size=(4, 30))
+    weights = rng.random((4, 30))
+    coefs, intercept = LinearSolver.solve(X, y, weights=weights, fitIntercept=fit_intercept)
+    for i in range(4):
+        model = LinearRegression(fit_intercept=fit_intercept).fit(X[i], y[i], sample_weight=weights[i])
+        assert np.allclose(coefs[i], model.coef_)
+        assert np.isclose(intercept[i], model.intercept_)
+
+
+def test_solve_rank_deficient_window_gives_minimum_norm_solution():
+    rng = np.random.default_rng(2)
+    X = rng.normal(size=(2, 20, 3))
+    X[1, :, 2] = 0
+    y = rng.normal(size=(2, 20))
+    coefs, _ = LinearSolver.solve(X, y)
+    model = LinearRegression(fit_intercept=False).fit(X[1], y[1])
+    assert np.allclose(coefs[1], model.coef_)
+    assert coefs[1, 2] == 0
@@ -0,0 +1,175 @@
+import warnings
+import optuna
+import numpy as np
+import pytest
+from sklearn.neural_network import MLPRegressor
+from src.models.DataPlane import DataPlane
+from src.models.MLPModel import MLPCommittee, MLPModel, StackedMLPCommittee
+from src.models.ModelScheduler import ModelScheduler
+from src.models.ResultCache import ResultCache
+
+
+@pytest.fixture
+def regression():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(250, 4))
+    return X, X @ rng.normal(size=4) + rng.normal(0, 0.3, len(X))
+
+
+def sklearn_member(X, y, params, coefs, intercepts):
+    # MLPRegressor trained from the given initial weights
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        model = MLPRegressor(**{**params, "max_iter": 1}).fit(X, y)
+        model.set_params(warm_start=True, max_iter=params["max_iter"])
+        model.coefs_, model.intercepts_ = coefs, intercepts
+        model.loss_curve_, model.best_loss_, model._no_improvement_count, model.t_ = [], np.inf, 0, 0
+        del model._optimizer
+        return model.fit(X, y)
+
+
+@pytest.mark.parametrize("params", [
+    {"hidden_layer_sizes": (6, 3), "max_iter": 30},
+    {"hidden_layer_sizes": (5,), "max_iter": 30, "solver": "sgd", "activation": "tanh"},
+    {"hidden_layer_sizes": (5,), "max_iter": 200, "activation": "logistic", "tol": 0.01, "n_iter_no_change": 2},
+])
+def test_stacked_committee_matches_sklearn_members(regression, params):
+    X, y = regression
+    params = {**params, "shuffle": False, "random_state": 0}
+    initial = StackedMLPCommittee(n_members=2, **{**params, "max_iter": 0}).fit(X, y)
+    stacked = StackedMLPCommittee(n_members=2, **params).fit(X, y)
+    members = [
+        sklearn_member(X, y, params, [coef[m].copy() for coef in initial.coefs_], [intercept[m, 0].copy() for intercept in initial.intercepts_])
+        for m in range(2)
+    ]
+    assert stacked.n_iter_.tolist() == [member.n_iter_ for member in members]
+    assert stacked.predict(X) == pytest.approx(np.mean([member.predict(X) for member in members], axis=0))
+
+
+def test_stacked_committee_falls_back_to_sklearn(regression):
+    X, y = regression
+    committee = StackedMLPCommittee(n_members=2, solver="lbfgs", hidden_layer_sizes=(3,), max_iter=50).fit(X, y)
+    assert len(committee.models_) == 2
+    assert committee.predict(X).shape == (len(X),)
+
+
+def test_stacked_mlp_model(model_data):
+    model = MLPModel(["load_d-1", "load_d-7", "is_weekend"], trainingWindow=28, modelParams={"hidden_layer_sizes": (5,), "max_iter": 50}, stacked=True)
+    results = model.run(1, model_data, "2024-04-01", "2024-04-01", "load")
+    assert len(results) == 24
+    assert np.isfinite(results.column("prediction")).all()
+
+
+def test_warm_start_reinitializes_every_n_days(regression, monkeypatch):
+    X, y = regression
+    fitted = []
+    fitArray = MLPModel.fitArray
+
+    def countingFit(trainX, trainY, testX, context):
+        fitted.append(context["dayInTestingPeriod"])
+        return fitArray(trainX, trainY, testX, context)
+
+    monkeypatch.setattr(MLPModel, "fitArray", countingFit)
+    model = MLPModel(modelParams={"hidden_layer_sizes": (3,), "max_iter": 20}, committee=2, stacked=True, warmStart=True, warmIterations=5, reinitializeEvery=3)
+    state = {}
+    for day in range(7):
+        context = {"dayInTestingPeriod": day, "modelParams": model.modelParams, "internalParams": model.internalParams}
+        prediction, _ = MLPModel.warmArray(X[day:day + 200], y[day:day + 200], X[day + 200:day + 201], context, state)
+        assert np.isfinite(prediction).all()
+        assert state["model"].n_iter_.max() == (20 if day % 3 == 0 else 5)
+    assert fitted == [0, 3, 6]
+    assert model.blockPeriod(7) == 3
+
+
+def test_refit_continues_from_the_fitted_weights(regression):
+    X, y = regression
+    committee = StackedMLPCommittee(n_members=2, hidden_layer_sizes=(3,), max_iter=20, shuffle=False, random_state=0).fit(X, y)
+    fitted = StackedMLPCommittee(n_members=2, hidden_layer_sizes=(3,), max_iter=20, shuffle=False, random_state=0).fit(X, y)
+    committee.refit(X, y, 5)
+    assert not np.allclose(committee.predict(X), fitted.predict(X))
+    assert np.mean((committee.predict(X) - y) ** 2) < np.mean((fitted.predict(X) - y) ** 2)
+
+
+def test_search_every_n_days(regression, monkeypatch):
+    X, y = regression
+    fits = []
+
+    def fakeFit(trainX, trainY, testX, context):
+        searching = context["internalParams"]["hyperparamOptimization"] == "cv"
+        fits.append((context["dayInTestingPeriod"], searching, context["modelParams"].get("alpha")))
+        return MLPCommittee(n_members=1, alpha=context["dayInTestingPeriod"] if searching else context["modelParams"]["alpha"], hidden_layer_sizes=(2,), max_iter=5).fit(trainX, trainY)
+
+    monkeypatch.setattr(MLPModel, "fitArray", fakeFit)
+    model = MLPModel(hyperparamOptimization="cv", searchEvery=3)
+    assert model.seriesArray is not None and model.blockPeriod(7) == 3
+    state, records = {}, []
+    for day in range(5):
+        context = {"dayInTestingPeriod": day, "modelParams": {}, "internalParams": model.internalParams}
+        _, params = MLPModel.warmArray(X[day:day + 200], y[day:day + 200], X[day + 200:day + 201], context, state)
+        records.append({"date": f"2024-04-0{day + 1}", "dayInTestingPeriod": day, "hour": 5, "horizon": 1, "coefs": params, **state["record"]})
+    assert fits == [(0, True, None), (1, False, 0), (2, False, 0), (3, True, None), (4, False, 3)]
+    summary = MLPModel.searchSummary(records)
+    assert summary[["searchDay", "date", "alpha"]].values.tolist() == [[0, "2024-04-01", 0], [3, "2024-04-04", 3]]
+
+
+def test_study_runs_trials_in_parallel_and_resumes(model_data, tmp_path, monkeypatch):
+    rounds, planes = [], []
+    run = ModelScheduler.run
+    build = DataPlane.build
+    monkeypatch.setattr(DataPlane, "build", lambda *args: planes.append(1) or build(*args))
+
+    def countingRun(models, *args, pool=None, **kwargs):
+        rounds.append((len(models), pool is not None))
+        return run(models, *args, pool=pool, **kwargs)
+
+    monkeypatch.setattr(ModelScheduler, "run", countingRun)
+    storage = str(tmp_path / "study.log")
+
+    def tune(trials):
+        model = MLPModel(
+            ["load_d-1", "is_weekend"], name="tuned", trainingWindow=28, committee=1, stacked=True,
+            modelParams={"hidden_layer_sizes": (3,), "solver": "adam", "max_iter": 20},
+            hyperparamOptimization=2, trials=trials, parallelTrials=2, studyStorage=storage,
+        )
+        model.run(1, model_data, "2024-04-01", "2024-04-01", "load")
+        return model
+
+    tune(3)
+    assert rounds == [(2, True), (1, True)]
+    # the trials read the data plane of the tuned run
+    assert len(planes) == 1
+    model = tune(4)
+    assert rounds[2:] == [(1, True)]
+    assert {"activation", "alpha", "learning_rate_init"} <= set(model.modelParams)
+    study = optuna.load_study(study_name="tuned", storage=optuna.storages.JournalStorage(optuna.storages.journal.JournalFileBackend(storage)))
+    assert len(study.trials) == 4
+
+
+def test_hopeless_trials_are_pruned(model_data, monkeypatch):
+    collected = {}
+    collect = MLPModel.collect
+
+    def countingCollect(self, job, block):
+        collected[self.name] = collected.get(self.name, 0) + len(block)
+        return collect(self, job, block)
+
+    monkeypatch.setattr(MLPModel, "collect", countingCollect)
+    model = MLPModel(
+        ["load_d-1", "is_weekend"], name="pruned", trainingWindow=28, committee=1, stacked=True,
+        modelParams={"hidden_layer_sizes": (3,), "solver": "adam", "max_iter": 20},
+        hyperparamOptimization=6, trials=2, pruner=optuna.pruners.ThresholdPruner(upper=0),
+    )
+    model.run(1, model_data, "2024-04-01", "2024-04-01", "load")
+    trials = {name: count for name, count in collected.items() if "trial" in name}
+    assert len(trials) == 2
+    assert all(count < 6 * 24 for count in trials.values())
+    assert "activation" not in model.modelParams
+
+
+def test_study_settings_leave_the_cache_key_unchanged(tmp_path):
+    def key(**kwargs):
+        return ResultCache.setup(MLPModel(["load_d-1"], hyperparamOptimization=6, **kwargs), "load")
+
+    assert key(pruner=optuna.pruners.MedianPruner()) == key(pruner=optuna.pruners.MedianPruner())
+    assert key(trials=2, parallelTrials=2, studyStorage=str(tmp_path / "study.log")) == key()
+    assert key(committee=3) != key()
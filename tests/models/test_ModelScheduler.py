@@ -0,0 +1,44 @@
+from src.models.LassoModel import LassoModel
+from src.models.ModelScheduler import ModelScheduler
+from src.models.NaiveModel import NaiveModel
+from src.models.OLSModel import OLSModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "is_holiday", "temperature"]
+args = ("2024-04-01", "2024-04-03", "load")
+
+
+def models():
+    return [
+        OLSModel(predictors, name="OLS", trainingWindow=28),
+        NaiveModel(["load_d-7"], name="Naive"),
+        OLSModel(predictors, name="OLS batched", trainingWindow=28, engine="batched"),
+    ]
+
+
+def test_global_scheduler_matches_sequential_runs(model_data):
+    expected = [model.run(2, model_data, *args) for model in models()]
+    assert ModelScheduler.run(models(), 2, model_data, *args) == expected
+
+
+def test_longest_tasks_first(model_data):
+    # NaiveModel itself runs without the pool
+    naive = type("NaivePool", (NaiveModel,), {"directArray": None})
+    jobs = [naive(["load_d-7"]).prepare(1, model_data, *args), LassoModel(predictors).prepare(1, model_data, *args)]
+    try:
+        order = [job["model"] for job, _ in ModelScheduler.order(jobs)]
+        assert order == sorted(order, key=lambda model: model.cost, reverse=True)
+        assert order[0] is jobs[1]["model"] and order[-1] is jobs[0]["model"]
+    finally:
+        for job in jobs:
+            job["model"].release(job)
+
+
+def test_jobs_of_the_same_cost_take_turns(model_data):
+    jobs = [OLSModel(predictors, name=name, blockSize=1).prepare(1, model_data, *args) for name in ("first", "second")]
+    try:
+        names = [job["model"].name for job, _ in ModelScheduler.order(jobs)]
+        assert len(names) == 2 * 3 * 24
+        assert names[:4] == ["first", "second", "first", "second"]
+    finally:
+        for job in jobs:
+            job["model"].release(job)
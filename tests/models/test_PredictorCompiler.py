@@ -0,0 +1,52 @@
+import multiprocessing as mp
+import pytest
+from src.models.DataPlane import DataPlane
+from src.models.OLSModel import OLSModel
+from src.models.PredictorCompiler import PredictorCompiler
+
+columns = ["load", "load_d-1", "load_d-6", "load_d-5", "is_holiday_d+1", "is_holiday_d+2", "hour_3"]
+
+
+def context(hour=0, horizon=1, day=0):
+    return {"hour": hour, "dayInTestingPeriod": day, "datasetOffset": 10, "horizon": horizon, "trainingWindow": 7, "target": f"load_d+{horizon}"}
+
+
+def test_compile_templates_and_callables():
+    compiler = PredictorCompiler(["load", "is_holiday_d+{horizon}", lambda ctx: f"load_d-{7 - ctx['horizon']}"], columns)
+    assert compiler.compile(context(horizon=2)) == (["load", "is_holiday_d+2", "load_d-5"], [0, 5, 3])
+
+
+def test_compile_callable_spec():
+    compiler = PredictorCompiler(lambda ctx: ["load", f"hour_{ctx['hour']}"], columns)
+    assert compiler.compile(context(hour=3)) == (["load", "hour_3"], [0, 6])
+
+
+def test_compile_once_per_hour_and_horizon():
+    calls = []
+    compiler = PredictorCompiler([lambda ctx: calls.append(ctx) or "load"], columns)
+    for day in range(5):
+        compiler.compile(context(day=day))
+    compiler.compile(context(horizon=2))
+    assert len(calls) == 2
+    assert not compiler.dayDependent
+
+
+def test_compile_day_dependent_callable():
+    compiler = PredictorCompiler([lambda ctx: "load" if ctx["dayInTestingPeriod"] < 1 else "load_d-1"], columns)
+    assert compiler.compile(context(day=0))[0] == ["load"]
+    assert compiler.compile(context(day=1))[0] == ["load_d-1"]
+    assert compiler.dayDependent
+
+
+def test_compile_missing_column():
+    compiler = PredictorCompiler(["load", "temperature_d+{horizon}"], columns)
+    with pytest.raises(KeyError, match="temperature_d\\+1"):
+        compiler.compile(context())
+
+
+def test_missing_column_of_a_later_horizon_fails_before_the_pool(model_data, monkeypatch):
+    monkeypatch.setattr(mp, "Pool", None)
+    data = model_data.assign(**{"x_d+1": model_data["temperature"]})
+    with pytest.raises(KeyError, match="x_d\\+2"):
+        OLSModel(["load_d-1", "x_d+{horizon}"]).prepare(2, data, "2024-04-01", "2024-04-03", "load")
+    assert not DataPlane.planes
@@ -0,0 +1,49 @@
+import pytest
+from src.models.LassoModel import LassoModel
+from src.models.OLSModel import OLSModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "is_holiday", "temperature"]
+
+
+def run(model, data, start="2024-04-01", end="2024-04-07"):
+    return model.run(1, data, start, end, "load")
+
+
+def test_recalibration_reuses_fit(model_data):
+    daily = run(OLSModel(predictors, trainingWindow=28), model_data)
+    weekly = run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=3), model_data)
+    fits = {(r["dayInTestingPeriod"], r["hour"]): r for r in daily}
+    assert len(weekly) == len(daily) == 7 * 24
+    for record in weekly:
+        assert record["fitDay"] == record["dayInTestingPeriod"] - record["dayInTestingPeriod"] % 3
+        fit = fits[(record["fitDay"], record["hour"])]
+        assert record["coefs"] == pytest.approx(fit["coefs"])
+        if record["fitDay"] == record["dayInTestingPeriod"]:
+            assert record["prediction"] == pytest.approx(fit["prediction"])
+            assert record["testX"] == pytest.approx(fit["testX"])
+
+
+def test_recalibration_independent_of_blocks(model_data):
+    expected = run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=3, blockSize=7), model_data)
+    assert run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=3, blockSize=1), model_data) == expected
+
+
+def test_recalibrated_lasso(model_data):
+    results = run(LassoModel(predictors, trainingWindow=28, modelParams={"cv": 3}, recalibrationEvery=7), model_data)
+    for hour in range(24):
+        coefs = [r["coefs"] for r in results if r["hour"] == hour]
+        assert all(c == coefs[0] for c in coefs)
+        assert {r["fitDay"] for r in results if r["hour"] == hour} == {0}
+
+
+def test_recalibration_with_cache(model_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=2, cache=True), model_data, end="2024-04-04")
+    # shifted start moves the fit days, the cached forecasts must not be reused with their old fits
+    shifted = run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=2, cache=True), model_data, "2024-04-02", "2024-04-04")
+    assert shifted == run(OLSModel(predictors, trainingWindow=28, recalibrationEvery=2), model_data, "2024-04-02", "2024-04-04")
+
+
+def test_recalibration_needs_pool_engine():
+    with pytest.raises(ValueError):
+        OLSModel(predictors, engine="batched", recalibrationEvery=7)
@@ -0,0 +1,64 @@
+import pytest
+from src.models.ModelWorker import ModelWorker
+from src.models.OLSModel import OLSModel
+
+predictors = ["load", "load_d-1", "is_weekend", "temperature"]
+
+
+@pytest.fixture
+def computed_days(monkeypatch):
+    computed = []
+    batchWorker = ModelWorker.batchWorker
+
+    def countingWorker(data, context, days, *args):
+        computed.extend((day, context["horizon"], context["hour"]) for day in days)
+        return batchWorker(data, context, days, *args)
+
+    monkeypatch.setattr(ModelWorker, "batchWorker", countingWorker)
+    return computed
+
+
+def run(data, start="2024-04-01", end="2024-04-02", **kwargs):
+    return OLSModel(predictors, trainingWindow=14, engine="batched", cache=True, **kwargs).run(1, data, start, end, "load")
+
+
+def test_cache_reuses_results(model_data, computed_days, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = run(model_data)
+    assert len(computed_days) == 48
+    assert run(model_data) == first
+    assert len(computed_days) == 48
+
+
+def test_cache_extends_test_period(model_data, computed_days, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(model_data)
+    extended = run(model_data, end="2024-04-03")
+    assert len(computed_days) == 48 + 24
+    assert extended == OLSModel(predictors, trainingWindow=14, engine="batched").run(1, model_data, "2024-04-01", "2024-04-03", "load")
+
+
+def test_cache_shifted_test_period_start(model_data, computed_days, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(model_data, start="2024-04-01", end="2024-04-03")
+    shifted = run(model_data, start="2024-04-02", end="2024-04-03")
+    assert len(computed_days) == 72
+    assert shifted == OLSModel(predictors, trainingWindow=14, engine="batched").run(1, model_data, "2024-04-02", "2024-04-03", "load")
+
+
+def test_cache_invalidated_by_data_and_params(model_data, computed_days, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    run(model_data)
+    changed = model_data.copy()
+    changed.loc["2024-04-02 05:00", "temperature"] += 1
+    run(changed)
+    assert computed_days[48:] == [(1, 1, 5)]
+    run(model_data, modelParams={"fit_intercept": True})
+    assert len(computed_days) == 48 + 1 + 48
+
+
+def test_cache_with_pool_engine(model_data, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = OLSModel(predictors, trainingWindow=14, cache=True).run(1, model_data, "2024-04-01", "2024-04-01", "load")
+    monkeypatch.setattr(ModelWorker, "blockWorker", None)
+    assert OLSModel(predictors, trainingWindow=14, cache=True).run(1, model_data, "2024-04-01", "2024-04-01", "load") == first
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+from src.models.ModelWorker import ModelWorker
+from src.models.RowIndex import RowIndex
+
+
+def preprocessed(hours=24 * 20, drop=()):
+    index = pd.date_range("2024-01-01 01:00", periods=hours, freq="h")
+    data = pd.DataFrame({"load": np.arange(hours, dtype=float)}, index=index)
+    data["hour"] = index.hour
+    data["day"] = np.arange(1, hours + 1) // 24
+    return data.drop(data.index[list(drop)])
+
+
+def test_build_row_index():
+    data = preprocessed()
+    rowIndex = RowIndex.build(data["day"], data["hour"])
+    assert rowIndex.positions.shape == (21, 24)
+    assert rowIndex.positions[0, 0] == -1
+    assert rowIndex.positions[0, 1] == 0
+    assert rowIndex.positions[1, 0] == 23
+
+
+def test_build_row_index_with_repeated_hours():
+    data = preprocessed()
+    assert RowIndex.build(np.append(data["day"], 0), np.append(data["hour"], 5)) is None
+
+
+def test_extract_train_and_test_matches_masks():
+    data = preprocessed(drop=[50, 51, 100])
+    rowIndex = RowIndex.build(data["day"], data["hour"])
+    for hour in [0, 2, 4, 23]:
+        for day in range(3):
+            expected = ModelWorker.extractTrainAndTest(data, hour, day, 10, 2, 5)
+            actual = ModelWorker.extractTrainAndTest(data, hour, day, 10, 2, 5, rowIndex)
+            pd.testing.assert_frame_equal(expected[0], actual[0])
+            pd.testing.assert_frame_equal(expected[1], actual[1])
+
+
+def test_series_windows_match_masks():
+    data = preprocessed(drop=[50, 51, 100])
+    rowIndex = RowIndex.build(data["day"], data["hour"])
+    for hour in [2, 4]:
+        expected = ModelWorker.extractTrainAndTestBatch(data, hour, [0, 1, 2], 10, 2, 5)
+        actual = ModelWorker.extractTrainAndTestBatch(data, hour, [0, 1, 2], 10, 2, 5, rowIndex)
+        assert all(np.array_equal(e, a) for e, a in zip(expected[0], actual[0]))
+        assert np.array_equal(expected[1], actual[1])
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from src.models.WLSModel import WLSModel
+from src.models.OLSModel import OLSModel
+
+predictors = ["load", "load_d-1", "load_d-7", "is_weekend", "temperature"]
+args = (2, "2024-04-01", "2024-04-02", "load")
+
+
+def run(model, data):
+    horizon, start, end, target = args
+    return model.run(horizon, data, start, end, target)
+
+
+@pytest.mark.parametrize("model_class,kwargs", [
+    (OLSModel, {}),
+    (OLSModel, {"modelParams": {"fit_intercept": True}}),
+    (WLSModel, {}),
+])
+def test_windows_match_separate_runs(model_data, model_class, kwargs):
+    windows = [28, 14, 56]
+    separate = [run(model_class(predictors, trainingWindow=window, **kwargs), model_data) for window in sorted(windows)]
+    combined = run(model_class(predictors, trainingWindow=windows, **kwargs), model_data)
+    assert len(combined) == 2 * 2 * 24
+    expected = np.column_stack([results.column("prediction") for results in separate])
+    assert combined.column("windowPredictions") == pytest.approx(expected, rel=1e-9)
+    assert combined.column("prediction") == pytest.approx(expected.mean(axis=1), rel=1e-9)
+    assert combined.column("coefs") == pytest.approx(separate[-1].column("coefs"), rel=1e-6, abs=1e-9)
+    assert combined[0]["trainingWindows"] == [14, 28, 56] and combined[0]["trainingWindow"] == 56
+
+
+def test_windows_need_the_pool_engine():
+    with pytest.raises(ValueError):
+        OLSModel(predictors, trainingWindow=[14, 28], engine="batched")
+    with pytest.raises(ValueError):
+        OLSModel(predictors, trainingWindow=[14, 28], recalibrationEvery=7)
+
+
+def test_windows_forecast_the_last_days_of_the_data(model_data):
+    args = (2, model_data, "2024-04-25", "2024-04-29", "load")
+    separate = [OLSModel(predictors, trainingWindow=window).run(*args) for window in (7, 14)]
+    combined = OLSModel(predictors, trainingWindow=[7, 14]).run(*args)
+    expected = np.column_stack([results.column("prediction") for results in separate])
+    assert np.isfinite(expected).all()
+    assert combined.column("windowPredictions") == pytest.approx(expected, rel=1e-9)
+
+
+def test_windows_with_missing_training_data(model_data):
+    data = model_data.copy()
+    data.loc["2024-03-25 05:00", "temperature"] = np.nan
+    with pytest.raises(ValueError, match="NaN"):
+        OLSModel(predictors, trainingWindow=[7, 14]).run(1, data, "2024-04-01", "2024-04-02", "load")
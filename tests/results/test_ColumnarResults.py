@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.evaluators.CoefsEvaluator import CoefsEvaluator
+from src.evaluators.MaeEvaluator import MaeEvaluator
+from src.models.OLSModel import OLSModel
+from src.results.ColumnarResults import ColumnarResults
+
+predictors = ["load", "load_d-1", lambda ctx: "is_weekend" if ctx["horizon"] == 1 else "temperature"]
+
+
+@pytest.fixture(scope="module")
+def results(model_data):
+    return OLSModel(predictors, trainingWindow=14).run(2, model_data, "2024-04-01", "2024-04-03", "load")
+
+
+def test_typed_columns(results):
+    assert isinstance(results, ColumnarResults) and len(results) == 144
+    assert results.column("date").dtype == "datetime64[D]"
+    assert results.column("hour").dtype == np.int64
+    assert results.column("prediction").dtype == np.float64
+    assert results.column("coefs").shape == results.column("testX").shape == (144, 3)
+    assert results.column("modelParams").dtype == object
+    record = results[0]
+    assert record["date"] == "2024-04-01" and isinstance(record["hour"], int) and isinstance(record["coefs"], list)
+    assert ColumnarResults.fromRecords(list(results)) == results
+
+
+def test_chunks_with_different_fields():
+    records = [
+        {"date": "2024-04-01", "hour": 0, "horizon": 1, "prediction": 1.5, "value": 2, "coefs": [1.0, 2.0]},
+        {"date": "2024-04-01", "hour": 1, "horizon": 1, "prediction": 2.5, "value": 2.5, "coefs": {"alpha": 1}, "fitDay": 0},
+    ]
+    results = ColumnarResults.fromChunks([records[:1], records[1:]])
+    assert list(results) == records
+    assert results.column("value").dtype == np.float64
+
+
+def test_mae_evaluator(results):
+    errors = pd.DataFrame(list(results)).assign(error=lambda df: (df["prediction"] - df["value"]).abs())
+    assert MaeEvaluator(type="all").evaluate(results)["overall_mae"] == pytest.approx(errors["error"].mean())
+    daily = MaeEvaluator(type="daily").evaluate(results)
+    assert list(daily) == ["horizon_1", "horizon_2"]
+    assert daily["horizon_2"] == pytest.approx(errors[errors["horizon"] == 2]["error"].mean())
+    hourly = MaeEvaluator(type="hourly").evaluate(list(results))
+    assert hourly["hour_5"]["horizon_1"] == pytest.approx(errors[(errors["hour"] == 5) & (errors["horizon"] == 1)]["error"].mean())
+
+
+def test_coefs_evaluator(results):
+    daily = CoefsEvaluator(type="daily").evaluate(results)
+    assert list(daily.columns) == ["is_weekend", "load", "load_d-1", "temperature"]
+    assert np.isnan(daily.loc[1, "temperature"]) and np.isnan(daily.loc[2, "is_weekend"])
+    first = results.column("coefs")[results.column("horizon") == 1]
+    assert daily.loc[1, "load"] == pytest.approx(first[:, 0].mean())
+    base = pd.DataFrame({"datetime": results.datetimes()[:3]})
+    merged = CoefsEvaluator().append_metrics_to_df(base, {"OLS": results})
+    assert merged["coef_OLS_load"].tolist() == pytest.approx(results.column("coefs")[:3, 0].tolist())
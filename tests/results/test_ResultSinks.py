@@ -0,0 +1,128 @@
+import json
+import pandas as pd
+import pytest
+from src.evaluators.CoefsEvaluator import CoefsEvaluator
+from src.evaluators.EvaluatorPipeline import EvaluatorPipeline
+from src.evaluators.MaeEvaluator import MaeEvaluator
+from src.models.OLSModel import OLSModel
+from src.results.ColumnarResults import ColumnarResults
+from src.results.JsonLinesSink import JsonLinesSink
+from src.results.ParquetSink import ParquetSink
+
+predictors = ["load", "load_d-1", "is_weekend", "temperature"]
+
+
+def key(record):
+    return record["dayInTestingPeriod"], record["horizon"], record["hour"]
+
+
+@pytest.fixture
+def expected(model_data):
+    return OLSModel(predictors, trainingWindow=14).run(2, model_data, "2024-04-01", "2024-04-03", "load")
+
+
+@pytest.mark.parametrize("engine", ["pool", "batched"])
+def test_json_lines_sink(model_data, tmp_path, engine):
+    expected = OLSModel(predictors, trainingWindow=14, engine=engine).run(2, model_data, "2024-04-01", "2024-04-03", "load")
+    results = OLSModel(predictors, trainingWindow=14, engine=engine, sink=JsonLinesSink(tmp_path / "ols.jsonl", chunkSize=50)).run(
+        2, model_data, "2024-04-01", "2024-04-03", "load"
+    )
+    assert len(results) == len(expected) == 144
+    assert [len(chunk) for chunk in results.chunks()] == [50, 50, 44]
+    assert sorted(results, key=key) == expected
+    assert results[0] in expected and results[-1] in expected
+    assert MaeEvaluator(type="all").evaluate(results) == pytest.approx(MaeEvaluator(type="all").evaluate(expected))
+
+
+class RecordingSink(JsonLinesSink):
+    def open(self):
+        super().open()
+        self.writes = []
+
+    def write(self, records):
+        records = list(records)
+        self.writes.append(len(records))
+        super().write(records)
+
+
+@pytest.mark.parametrize("engine", ["pool", "batched"])
+def test_sink_streams_every_series_of_resumed_runs(model_data, tmp_path, monkeypatch, engine):
+    monkeypatch.chdir(tmp_path)
+    OLSModel(predictors, trainingWindow=14, engine=engine, cache=True).run(2, model_data, "2024-04-01", "2024-04-03", "load")
+    sink = RecordingSink(tmp_path / "ols.jsonl")
+    results = OLSModel(predictors, trainingWindow=14, engine=engine, cache=True, sink=sink).run(
+        2, model_data, "2024-04-01", "2024-04-05", "load"
+    )
+    assert len(results) == sum(sink.writes) == 240
+    # cached days and new ones reach the sink one (hour, horizon) series at a time, not as one list at the end
+    assert max(sink.writes) <= 5
+
+
+def test_pipeline_reads_sinks_chunk_by_chunk(model_data, tmp_path, monkeypatch):
+    sheets = {}
+    for name, sink in (("memory", None), ("sink", JsonLinesSink(tmp_path / "ols.jsonl", chunkSize=50))):
+        pipeline = EvaluatorPipeline(model_data, "2024-04-01", "2024-04-03", horizon=2, details=True)
+        pipeline.add_model(OLSModel(predictors, name="OLS", trainingWindow=14, sink=sink))
+        for evaluator in (MaeEvaluator(type="hourly"), MaeEvaluator(type="details"), CoefsEvaluator(type="daily"), CoefsEvaluator(type="details")):
+            pipeline.add_evaluator(evaluator)
+        build, concat = ColumnarResults.build, ColumnarResults.concat
+        sizes = []
+        monkeypatch.setattr(ColumnarResults, "build", staticmethod(lambda records: sizes.append(len(records)) or build(records)))
+        monkeypatch.setattr(ColumnarResults, "concat", staticmethod(lambda parts: sizes.append(sum(len(part) for part in parts)) or concat(parts)))
+        pipeline.execute(tmp_path / f"{name}.xlsx")
+        monkeypatch.undo()
+        sheets[name] = pd.read_excel(tmp_path / f"{name}.xlsx", sheet_name=None)
+        if sink is not None:
+            # the evaluators never hold more than one chunk of the sink as columns
+            assert sizes and max(sizes) <= 50
+    assert sheets["memory"].keys() == sheets["sink"].keys()
+    for sheet in sheets["memory"]:
+        # the records of a sink, and so the rows of the details sheet, are in completion order
+        memory, sink = (sheets[name][sheet] for name in ("memory", "sink"))
+        if sheet == "Detailed_Comparison":
+            memory, sink = (df.sort_values(["datetime", "horizon"], ignore_index=True) for df in (memory, sink))
+        pd.testing.assert_frame_equal(memory, sink)
+
+
+def test_sink_is_reopened_by_every_run(model_data, tmp_path):
+    model = OLSModel(predictors, trainingWindow=14, sink=JsonLinesSink(tmp_path / "ols.jsonl"))
+    model.run(1, model_data, "2024-04-01", "2024-04-03", "load")
+    assert len(model.run(1, model_data, "2024-04-01", "2024-04-01", "load")) == 24
+    with open(tmp_path / "ols.jsonl") as f:
+        assert len(f.readlines()) == 24
+
+
+def test_save_to_file_with_sink(model_data, expected, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "results").mkdir()
+    OLSModel(predictors, trainingWindow=14, sink=JsonLinesSink(tmp_path / "ols.jsonl"), saveToFile="ols.json").run(
+        2, model_data, "2024-04-01", "2024-04-03", "load"
+    )
+    with open(tmp_path / "results" / "ols.json") as f:
+        assert sorted(json.load(f), key=key) == expected
+
+
+def test_parquet_sink(model_data, expected, tmp_path):
+    pytest.importorskip("pyarrow")
+    results = OLSModel(predictors, trainingWindow=14, sink=ParquetSink(tmp_path / "ols.parquet", rowGroupSize=50)).run(
+        2, model_data, "2024-04-01", "2024-04-03", "load"
+    )
+    assert [len(chunk) for chunk in results.chunks(50)] == [50, 50, 44]
+    assert sorted(results, key=key) == expected
+
+
+def test_parquet_sink_keeps_records_with_other_fields(tmp_path):
+    pytest.importorskip("pyarrow")
+    records = [
+        {"hour": 0, "prediction": 1.0, "coefs": [0.5]},
+        {"hour": 1, "prediction": 2.0, "coefs": [0.5], "fitDay": 0},
+        {"hour": 2, "coefs": [0.25]},
+        {"hour": 3, "prediction": 4.0, "coefs": [0.5], "searchDay": 1, "params": {"alpha": 0.1}},
+        {"hour": 4, "prediction": None, "coefs": None},
+    ]
+    sink = ParquetSink(tmp_path / "records.parquet", rowGroupSize=2)
+    sink.open()
+    sink.write(records)
+    results = sink.close()
+    assert len(results) == 5
+    assert list(results) == records
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from src.scalers.StandardScaler import StandardScaler
+
+predictors = ["load_d-1", "is_weekend", "temperature"]
+
+
+def test_series_scaling_matches_window_scaling():
+    rng = np.random.default_rng(0)
+    X = np.column_stack([1e4 + rng.normal(0, 20, 100), rng.integers(0, 2, 100), np.r_[np.full(40, 12.5), rng.normal(10, 3, 60)]])
+    y = 1e4 + rng.normal(0, 30, 100)
+    starts, stops = np.arange(0, 60, 5), np.arange(0, 60, 5) + 28
+    center, scale, yCenter, yScale = StandardScaler().fitSeries(X, y, starts, stops, np.array([100, 2, 61]), predictors, "load_d+1")
+    for i, (start, stop) in enumerate(zip(starts, stops)):
+        trainX, trainY = X[start:stop], y[start:stop]
+        assert center[i, :2] == pytest.approx([trainX[:, 0].mean(), 0], rel=1e-12)
+        assert yCenter[i] == pytest.approx(trainY.mean(), rel=1e-12)
+        assert yScale[i] == pytest.approx(trainY.std(), rel=1e-9)
+        assert scale[i, :2] == pytest.approx([trainX[:, 0].std(), 1], rel=1e-9)
+        # constant temperature in the first windows is a dummy there, it is not scaled
+        assert (center[i, 2], scale[i, 2]) == ((0, 1) if stop <= 40 else (pytest.approx(trainX[:, 2].mean(), rel=1e-12), pytest.approx(trainX[:, 2].std(), rel=1e-9)))
+
+
+def test_windows_with_at_most_two_values():
+    values = np.array([1, 1, 2, 2, 1, 3, 3, 3, 4, 4], dtype=float)
+    starts, stops = np.array([0, 0, 3, 5, 2, 9]), np.array([5, 6, 6, 10, 9, 10])
+    twoValued = [True, False, False, True, False, True]
+    assert StandardScaler.twoValued(values, starts, stops).tolist() == twoValued
+    X = np.column_stack([values, values % 2])
+    _, scale, _, _ = StandardScaler().fitSeries(X, np.arange(10.0), starts, stops, np.array([4, 2]), ["month", "flag"], "load")
+    assert scale[:, 0].tolist() == [1 if few else pytest.approx(values[start:stop].std()) for few, start, stop in zip(twoValued, starts, stops)]
+    assert (scale[:, 1] == 1).all()